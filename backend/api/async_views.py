@@ -0,0 +1,398 @@
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import BooleanField, F, Value, Window
+from django.db.models.functions import RowNumber
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from recipes.models import (
+    CatalogVersion, Ingredient, IngredientInRecipe, Recipe, Tag,
+)
+from recipes.search import search
+from rest_framework.authentication import get_authorization_header
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from users.authentication import ClaimsJWTAuthentication, aget_token_user
+from users.models import User
+from users.serializers import FollowSerializer, get_recipes_limit
+from users.views import CustomUserViewSet
+
+from .cache import aget_anonymous_list
+from .conditional import (
+    catalog_etag, recipe_state_etag, recipe_state_last_modified,
+    recipe_state_query,
+)
+from .filters import RecipeFilter
+from .ingredient_index import ingredient_index
+from .pagination import CustomPagination
+from .serializers import (
+    IngredientSerializer, RecipeReadSerializer, TagSerializer,
+)
+from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+RECIPE_FIELDS = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+def read_view(handler, fallback):
+    '''Асинхронное представление для чтения.
+
+    GET обрабатывает handler; если он вернул None (ошибка, редкий
+    режим вроде курсорной пагинации или браузерного API), запрос
+    целиком уходит в обычное представление DRF, как и любые записи.
+    '''
+
+    async def view(request, *args, **kwargs):
+        if request.method == 'GET' and 'format' not in request.GET:
+            try:
+                response = await handler(request, *args, **kwargs)
+            except APIException:
+                response = None
+            if response is not None:
+                return response
+        return await sync_to_async(fallback)(request, *args, **kwargs)
+
+    # csrf_exempt в Django 4.2 оборачивает корутину синхронной функцией.
+    view.csrf_exempt = True
+    return view
+
+
+def render(data):
+    return HttpResponse(
+        JSONRenderer().render(data), content_type='application/json'
+    )
+
+
+async def authenticate(request):
+    '''Пользователь по заголовку Authorization, как аутентификация DRF,
+    но через асинхронные кеш и ORM. Для неверного токена возвращает None:
+    ответ с ошибкой построит DRF.'''
+    auth = get_authorization_header(request).split()
+    if auth and auth[0].lower() == b'bearer' and settings.AUTH_JWT:
+        try:
+            # Проверка подписи JWT к базе не обращается.
+            result = ClaimsJWTAuthentication().authenticate(request)
+        except APIException:
+            return None
+        if result is None:
+            return None
+        request.user = result[0]
+        return request.user
+    if not auth or auth[0].lower() != b'token':
+        request.user = AnonymousUser()
+        return request.user
+    if len(auth) != 2:
+        return None
+    try:
+        user = await aget_token_user(auth[1].decode())
+    except UnicodeError:
+        return None
+    if user is None:
+        return None
+    request.user = user
+    return request.user
+
+
+async def not_modified(request, etag, last_modified):
+    '''Ответ 304/412 по If-None-Match и If-Modified-Since или None,
+    как декоратор condition, которого для async в Django 4.2 нет.'''
+    return get_conditional_response(
+        request,
+        etag=etag and quote_etag(etag),
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+
+
+def with_validators(response, etag, last_modified):
+    if etag:
+        response.headers.setdefault('ETag', quote_etag(etag))
+    if last_modified:
+        response.headers.setdefault(
+            'Last-Modified', http_date(last_modified.timestamp())
+        )
+    return response
+
+
+async def catalog_response(request, catalog, load):
+    '''Ответ справочника с валидаторами по его версии; load(version)
+    получает ту же версию, что ушла в ETag.'''
+    version = await CatalogVersion.objects.filter(catalog=catalog).afirst()
+    etag = catalog_etag(version)
+    last_modified = version and version.updated_at
+    response = await not_modified(request, etag, last_modified)
+    if response is None:
+        data = await load(version)
+        if data is None:
+            return None
+        response = render(data)
+    return with_validators(response, etag, last_modified)
+
+
+def page_number(request):
+    page = request.GET.get('page', '1')
+    return int(page) if page.isdigit() and int(page) > 0 else None
+
+
+def page_size(request):
+    limit = request.GET.get(CustomPagination.page_size_query_param, '')
+    if limit.isdigit() and int(limit) > 0:
+        return int(limit)
+    return CustomPagination.page_size
+
+
+async def paginate(request, queryset, load):
+    '''Страница в формате CustomPagination. None для несуществующей
+    страницы — ошибку вернёт DRF.'''
+    page, size = page_number(request), page_size(request)
+    if page is None:
+        return None
+    count = await queryset.acount()
+    offset = (page - 1) * size
+    if page > 1 and offset >= count:
+        return None
+    url = request.build_absolute_uri()
+    previous = None
+    if page == 2:
+        previous = remove_query_param(url, 'page')
+    elif page > 2:
+        previous = replace_query_param(url, 'page', page - 1)
+    return {
+        'count': count,
+        'next': (
+            replace_query_param(url, 'page', page + 1)
+            if offset + size < count else None
+        ),
+        'previous': previous,
+        'results': await load(queryset[offset:offset + size]),
+    }
+
+
+def set_prefetched(instance, name, items):
+    '''Кладёт связанные объекты туда же, куда их кладёт prefetch_related.'''
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = items
+    queryset._prefetch_done = True
+    instance.__dict__.setdefault('_prefetched_objects_cache', {})[name] = (
+        queryset
+    )
+
+
+async def load_recipes(queryset):
+    '''Рецепты с тегами и ингредиентами за три запроса, как
+    with_related(), но через асинхронный ORM.'''
+    recipes = [recipe async for recipe in queryset]
+    ids = [recipe.id for recipe in recipes]
+    tags, ingredients = defaultdict(list), defaultdict(list)
+    # Теги в том же порядке, что и в with_related().
+    async for link in Recipe.tags.through.objects.filter(
+        recipe_id__in=ids
+    ).select_related('tag').order_by('tag_id'):
+        tags[link.recipe_id].append(link.tag)
+    async for row in IngredientInRecipe.objects.filter(
+        recipe_id__in=ids
+    ).select_related('ingredient').order_by('id'):
+        ingredients[row.recipe_id].append(row)
+    for recipe in recipes:
+        if hasattr(recipe, 'author_is_subscribed'):
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+        set_prefetched(recipe, 'tags', tags[recipe.id])
+        set_prefetched(recipe, 'ingredientrecipes', ingredients[recipe.id])
+    return recipes
+
+
+def recipes_queryset(user):
+    return Recipe.objects.defer('search_vector').with_flat_user_flags(user)
+
+
+def filter_recipes(request, queryset):
+    filterset = RecipeFilter(request.GET, queryset=queryset, request=request)
+    if not filterset.is_valid():
+        return None
+    queryset = filterset.qs
+    text = request.GET.get('search', '').strip()
+    return search(queryset, text) if text else queryset
+
+
+async def recipe_list(request):
+    params = request.GET
+    if 'cursor' in params or 'pagination' in params:
+        return None
+    user = await authenticate(request)
+    if user is None:
+        return None
+    queryset = recipes_queryset(user)
+    if 'tags' in params:
+        # Слаги проверяются по индексу тегов, который может сходить в базу.
+        queryset = await sync_to_async(filter_recipes)(request, queryset)
+    else:
+        queryset = filter_recipes(request, queryset)
+    if queryset is None:
+        return None
+
+    async def load(page):
+        return RecipeReadSerializer(
+            await load_recipes(page), many=True, context={'request': request}
+        ).data
+
+    async def compute():
+        return await paginate(request, queryset, load)
+
+    if user.is_authenticated:
+        data = await compute()
+    else:
+        data = await aget_anonymous_list(request, compute)
+    return data and render(data)
+
+
+async def recipe_detail(request, pk):
+    user = await authenticate(request)
+    if user is None:
+        return None
+    state = await recipe_state_query(request, pk).afirst()
+    if state is None:
+        return None
+    etag = recipe_state_etag(request, state)
+    last_modified = recipe_state_last_modified(request, state)
+    response = await not_modified(request, etag, last_modified)
+    if response is None:
+        recipes = await load_recipes(
+            recipes_queryset(user).filter(pk=pk)
+        )
+        if not recipes:
+            return None
+        response = render(RecipeReadSerializer(
+            recipes[0], context={'request': request}
+        ).data)
+    return with_validators(response, etag, last_modified)
+
+
+async def tag_list(request):
+    async def load(version):
+        return TagSerializer(
+            [tag async for tag in Tag.objects.all()], many=True
+        ).data
+
+    return await catalog_response(request, CatalogVersion.TAGS, load)
+
+
+async def tag_detail(request, pk):
+    async def load(version):
+        tag = await Tag.objects.filter(pk=pk).afirst()
+        return tag and TagSerializer(tag).data
+
+    return await catalog_response(request, CatalogVersion.TAGS, load)
+
+
+async def ingredient_list(request):
+    async def load(version):
+        name = request.GET.get('name')
+        if not name:
+            return IngredientSerializer(
+                [item async for item in Ingredient.objects.all()], many=True
+            ).data
+        limit = request.GET.get('limit', '')
+        return await ingredient_index.asearch(
+            version, name, int(limit) if limit.isdigit() else None
+        )
+
+    return await catalog_response(request, CatalogVersion.INGREDIENTS, load)
+
+
+async def ingredient_detail(request, pk):
+    async def load(version):
+        ingredient = await Ingredient.objects.filter(pk=pk).afirst()
+        return ingredient and IngredientSerializer(ingredient).data
+
+    return await catalog_response(request, CatalogVersion.INGREDIENTS, load)
+
+
+async def subscriptions(request):
+    params = request.GET
+    if 'cursor' in params or 'pagination' in params:
+        return None
+    user = await authenticate(request)
+    if user is None or user.is_anonymous:
+        return None
+    try:
+        limit = get_recipes_limit(request)
+    except ValidationError:
+        return None
+    queryset = User.objects.filter(following__user=user).annotate(
+        is_subscribed=Value(True, output_field=BooleanField()),
+    ).order_by('id')
+
+    async def load(page):
+        authors = [author async for author in page]
+        recipes = Recipe.objects.filter(
+            author_id__in=[author.id for author in authors]
+        ).only(*RECIPE_FIELDS, 'author_id')
+        if limit is not None:
+            recipes = recipes.annotate(position=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=F('id').desc(),
+            )).filter(position__lte=limit)
+        by_author = defaultdict(list)
+        async for recipe in recipes.order_by('-id'):
+            by_author[recipe.author_id].append(recipe)
+        for author in authors:
+            author.limited_recipes = by_author[author.id]
+        return FollowSerializer(
+            authors, many=True, context={'request': request}
+        ).data
+
+    data = await paginate(request, queryset, load)
+    return data and render(data)
+
+
+recipe_list_view = read_view(
+    recipe_list,
+    RecipeViewSet.as_view(
+        {'get': 'list', 'post': 'create'}, basename='recipes', detail=False
+    ),
+)
+recipe_detail_view = read_view(
+    recipe_detail,
+    RecipeViewSet.as_view(
+        {
+            'get': 'retrieve',
+            'put': 'update',
+            'patch': 'partial_update',
+            'delete': 'destroy',
+        },
+        basename='recipes',
+        detail=True,
+    ),
+)
+tag_list_view = read_view(
+    tag_list,
+    TagViewSet.as_view({'get': 'list'}, basename='tags', detail=False),
+)
+tag_detail_view = read_view(
+    tag_detail,
+    TagViewSet.as_view({'get': 'retrieve'}, basename='tags', detail=True),
+)
+ingredient_list_view = read_view(
+    ingredient_list,
+    IngredientViewSet.as_view(
+        {'get': 'list'}, basename='ingredients', detail=False
+    ),
+)
+ingredient_detail_view = read_view(
+    ingredient_detail,
+    IngredientViewSet.as_view(
+        {'get': 'retrieve'}, basename='ingredients', detail=True
+    ),
+)
+subscriptions_view = read_view(
+    subscriptions,
+    CustomUserViewSet.as_view(
+        {'get': 'subscriptions'},
+        basename='user',
+        detail=False,
+        **CustomUserViewSet.subscriptions.kwargs,
+    ),
+)
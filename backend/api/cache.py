@@ -0,0 +1,154 @@
+import asyncio
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from recipes.models import Recipe, Tag
+
+VERSION_PREFIX = 'recipes:version:'
+LIST_PREFIX = 'recipes:list:'
+LOCK_PREFIX = 'recipes:lock:'
+CATALOG = 'catalog'
+ALL = 'all'
+# Порядок по счётчикам избранного и корзин (?ordering=).
+ORDERING = 'ordering'
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _author_id(value):
+    '''id автора из параметра запроса: «01» и «1» — один автор.'''
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _version_keys(request):
+    '''Версии, от которых зависит выдача с данными фильтрами.'''
+    author = _author_id(request.GET.get('author'))
+    tags = request.GET.getlist('tags')
+    keys = [CATALOG]
+    if author is not None:
+        keys.append(f'author:{author}')
+    keys.extend(f'tag:{slug}' for slug in sorted(set(tags)))
+    if author is None and not tags:
+        keys.append(ALL)
+    if request.GET.get('ordering'):
+        keys.append(ORDERING)
+    return [VERSION_PREFIX + key for key in keys]
+
+
+def _list_key(request, version_keys, versions):
+    params = sorted(
+        (name, sorted(request.GET.getlist(name))) for name in request.GET
+    )
+    raw = repr((
+        request.build_absolute_uri('/'),
+        params,
+        [versions.get(key) for key in version_keys],
+    ))
+    return LIST_PREFIX + hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def get_anonymous_list(request, compute):
+    '''Общий кеш выдачи рецептов для анонимов.
+
+    При промахе данные считает только тот, кто взял блокировку,
+    остальные ждут, пока он положит результат в кеш.
+    '''
+    version_keys = _version_keys(request)
+    key = _list_key(request, version_keys, cache.get_many(version_keys))
+    data = cache.get(key)
+    if data is not None:
+        return data
+    lock_key = LOCK_PREFIX + key
+    timeout = settings.RECIPE_LIST_CACHE_LOCK_TIMEOUT
+    deadline = time.monotonic() + timeout
+    while not cache.add(lock_key, 1, timeout):
+        time.sleep(LOCK_POLL_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return data
+        if time.monotonic() > deadline:
+            return compute()
+    try:
+        data = compute()
+        cache.set(key, data, settings.RECIPE_LIST_CACHE_TIMEOUT)
+    finally:
+        cache.delete(lock_key)
+    return data
+
+
+async def aget_anonymous_list(request, compute):
+    '''То же, что get_anonymous_list, для асинхронных представлений:
+    compute — корутинная функция, ожидание не занимает поток.'''
+    version_keys = _version_keys(request)
+    key = _list_key(
+        request, version_keys, await cache.aget_many(version_keys)
+    )
+    data = await cache.aget(key)
+    if data is not None:
+        return data
+    lock_key = LOCK_PREFIX + key
+    timeout = settings.RECIPE_LIST_CACHE_LOCK_TIMEOUT
+    deadline = time.monotonic() + timeout
+    while not await cache.aadd(lock_key, 1, timeout):
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        data = await cache.aget(key)
+        if data is not None:
+            return data
+        if time.monotonic() > deadline:
+            return await compute()
+    try:
+        data = await compute()
+        await cache.aset(key, data, settings.RECIPE_LIST_CACHE_TIMEOUT)
+    finally:
+        await cache.adelete(lock_key)
+    return data
+
+
+def invalidate(author_ids=(), tag_slugs=(), catalog=False):
+    '''Сбрасывает выдачи, в которые мог попасть изменённый рецепт.
+
+    Версии меняются после коммита транзакции, иначе параллельный
+    запрос успел бы закешировать данные до изменения под новой версией.
+    '''
+    keys = [ALL] + [f'author:{int(pk)}' for pk in author_ids]
+    keys.extend(f'tag:{slug}' for slug in tag_slugs)
+    if catalog:
+        keys.append(CATALOG)
+    versions = {VERSION_PREFIX + key: uuid.uuid4().hex for key in keys}
+    transaction.on_commit(lambda: cache.set_many(versions, None))
+
+
+def invalidate_ordering():
+    '''Сбрасывает только выдачи с ?ordering=: от счётчиков избранного
+    и корзин зависит лишь их порядок.'''
+    version = uuid.uuid4().hex
+    transaction.on_commit(
+        lambda: cache.set(VERSION_PREFIX + ORDERING, version, None)
+    )
+
+
+def invalidate_recipes(recipe_ids):
+    '''Сброс по id рецептов, которые после коммита ещё существуют.'''
+    recipe_ids = list(recipe_ids)
+
+    def resolve():
+        invalidate(
+            author_ids=set(
+                Recipe.objects.filter(pk__in=recipe_ids).values_list(
+                    'author_id', flat=True
+                )
+            ),
+            tag_slugs=set(
+                Tag.objects.filter(recipes__in=recipe_ids).values_list(
+                    'slug', flat=True
+                )
+            ),
+        )
+
+    transaction.on_commit(resolve)
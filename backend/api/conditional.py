@@ -0,0 +1,114 @@
+import hashlib
+
+from django.db.models import Exists, OuterRef, Subquery
+from django.views.decorators.http import condition
+from recipes.models import CatalogVersion, Favorite, Recipe, ShopingCart
+from users.models import Follow
+
+
+def _cached(request, key, loader):
+    '''Значение, вычисляемое один раз на запрос: condition() вызывает
+    функции ETag и Last-Modified по отдельности.'''
+    cache = request.__dict__.setdefault('_conditional_cache', {})
+    if key not in cache:
+        cache[key] = loader()
+    return cache[key]
+
+
+def catalog_etag(version):
+    return version and f'{version.catalog}-{version.version}'
+
+
+def catalog_version(request, catalog):
+    '''Версия справочника, по которой строятся валидаторы ответа.'''
+    return _cached(
+        request,
+        catalog,
+        lambda: CatalogVersion.objects.filter(catalog=catalog).first(),
+    )
+
+
+def catalog_condition(catalog):
+    '''ETag и Last-Modified по версии справочника.'''
+
+    def etag(request, *args, **kwargs):
+        return catalog_etag(catalog_version(request, catalog))
+
+    def last_modified(request, *args, **kwargs):
+        version = catalog_version(request, catalog)
+        return version and version.updated_at
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def _catalog_version(catalog):
+    return Subquery(
+        CatalogVersion.objects.filter(catalog=catalog).values('version')[:1]
+    )
+
+
+def recipe_state_query(request, pk):
+    '''Всё, от чего зависит ответ с рецептом, одним запросом.'''
+    user = request.user
+    queryset = Recipe.objects.filter(pk=pk).annotate(
+        tags_version=_catalog_version(CatalogVersion.TAGS),
+        ingredients_version=_catalog_version(CatalogVersion.INGREDIENTS),
+    )
+    fields = [
+        'updated_at',
+        'author__email',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'tags_version',
+        'ingredients_version',
+    ]
+    if user.is_authenticated:
+        queryset = queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(ShopingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+        )
+        fields += ['is_favorited', 'is_in_shopping_cart', 'is_subscribed']
+    return queryset.values_list(*fields)
+
+
+def recipe_state_etag(request, state):
+    if state is None:
+        return None
+    return hashlib.md5(
+        f'{request.user.pk}:{state}'.encode('utf-8')
+    ).hexdigest()
+
+
+def recipe_state_last_modified(request, state):
+    '''Только для анонимов: ответ для пользователя зависит ещё и от
+    избранного, корзины и подписок, у которых нет даты изменения.'''
+    if request.user.is_authenticated:
+        return None
+    return state and state[0]
+
+
+def _recipe_state(request, pk):
+    return _cached(
+        request, 'recipe', lambda: recipe_state_query(request, pk).first()
+    )
+
+
+def recipe_etag(request, pk=None, *args, **kwargs):
+    return recipe_state_etag(request, _recipe_state(request, pk))
+
+
+def recipe_last_modified(request, pk=None, *args, **kwargs):
+    return recipe_state_last_modified(request, _recipe_state(request, pk))
+
+
+recipe_condition = condition(
+    etag_func=recipe_etag, last_modified_func=recipe_last_modified
+)
@@ -1,15 +1,83 @@
 import base64
+import binascii
+import uuid
 
+from django.conf import settings
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
 
+def image_extension(header):
+    """Расширение картинки по первым 12 байтам файла или None."""
+    if header.startswith(b'\xff\xd8\xff'):
+        return 'jpeg'
+    if header.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if header.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if header.startswith(b'RIFF') and header[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
 class Base64ImageField(serializers.ImageField):
+    """Картинка в виде data URI с base64 или файла из multipart/form-data.
+
+    Размер и тип проверяются до декодирования картинки.
+    """
+    default_error_messages = {
+        'too_large': 'Размер картинки больше {max_size} байт.',
+        'invalid_type': 'Поддерживаются только JPEG, PNG, GIF и WebP.',
+    }
+
     def to_internal_value(self, data):
+        max_size = settings.RECIPE_IMAGE_MAX_SIZE
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-
-            data = ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
+            imgstr = data.partition(';base64,')[2]
+            if len(imgstr) * 3 // 4 > max_size:
+                self.fail('too_large', max_size=max_size)
+            try:
+                ext = image_extension(base64.b64decode(imgstr[:16]))
+                if ext is None:
+                    self.fail('invalid_type')
+                data = ContentFile(
+                    base64.b64decode(imgstr), name=f'{uuid.uuid4()}.{ext}'
+                )
+            except (binascii.Error, ValueError):
+                self.fail('invalid')
+        elif hasattr(data, 'read') and hasattr(data, 'size'):
+            if data.size > max_size:
+                self.fail('too_large', max_size=max_size)
+            header = data.read(12)
+            data.seek(0)
+            if image_extension(header) is None:
+                self.fail('invalid_type')
 
         return super().to_internal_value(data)
+
+
+class ImageVariantsField(serializers.Field):
+    """URL уменьшенных копий картинки: {вариант: {формат: url}}."""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return variant_urls(value, url_builder(self.context.get('request')))
+
+
+def url_builder(request):
+    """Функция, делающая из пути URL так же, как поля файлов DRF."""
+    return request.build_absolute_uri if request is not None else str
+
+
+def variant_urls(value, build_url):
+    return {
+        variant: {
+            extension: build_url(default_storage.url(name))
+            for extension, name in formats.items()
+        }
+        for variant, formats in (value or {}).items()
+    }
@@ -1,18 +1,62 @@
+from django import forms
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
-from recipes.models import Recipe, Tag
-from rest_framework.filters import SearchFilter
+from recipes.models import Favorite, Recipe, ShopingCart
+from recipes.search import search
+from rest_framework.filters import BaseFilterBackend, SearchFilter
+
+from .tag_index import tag_index
 
 
 class IngredientSearchFilter(SearchFilter):
     search_param = 'name'
 
 
+class RecipeSearchFilter(BaseFilterBackend):
+    '''Полнотекстовый поиск по названию, описанию и ингредиентам
+    с сортировкой по релевантности.'''
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search(queryset, text)
+
+
+class TagSlugField(forms.MultipleChoiceField):
+    '''Слаги тегов, проверяемые по индексу в памяти вместо запроса.'''
+
+    def valid_value(self, value):
+        return tag_index.get_id(value) is not None
+
+
+class TagsFilter(filters.MultipleChoiceFilter):
+    '''Рецепты хотя бы с одним из тегов: EXISTS по id тегов
+    вместо JOIN, без повторов рецепта в выдаче.'''
+    field_class = TagSlugField
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        return qs.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'),
+            tag_id__in={tag_index.get_id(slug) for slug in value},
+        )))
+
+
+class PopularityOrderingFilter(filters.OrderingFilter):
+    '''Сортировка по счётчикам рецепта; при равенстве новые выше.'''
+
+    def filter(self, qs, value):
+        qs = super().filter(qs, value)
+        if value:
+            qs = qs.order_by(*qs.query.order_by, '-id')
+        return qs
+
+
 class RecipeFilter(filters.FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
-    )
+    tags = TagsFilter()
     author = filters.CharFilter()
     is_favorited = filters.NumberFilter(
         method='filter_is_favorited'
@@ -20,17 +64,24 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = PopularityOrderingFilter(
+        fields=('favorites_count', 'in_carts_count')
+    )
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
 
-    def filter_is_favorited(self, queryset, name, value):
-        if value == 1 and self.request.user.is_authenticated:
-            return queryset.filter(favorites__user=self.request.user)
+    def _filter_by_user_link(self, queryset, model, value):
+        user = self.request.user
+        if value == 1 and user.is_authenticated:
+            return queryset.filter(Exists(model.objects.filter(
+                user=user, recipe_id=OuterRef('pk')
+            )))
         return queryset
 
+    def filter_is_favorited(self, queryset, name, value):
+        return self._filter_by_user_link(queryset, Favorite, value)
+
     def filter_is_in_shopping_cart(self, queryset, name, value):
-        if value == 1 and self.request.user.is_authenticated:
-            return queryset.filter(shopingcarts__user=self.request.user)
-        return queryset
+        return self._filter_by_user_link(queryset, ShopingCart, value)
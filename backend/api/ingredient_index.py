@@ -0,0 +1,90 @@
+import heapq
+import threading
+
+from bisect import bisect_left, bisect_right
+
+from asgiref.sync import sync_to_async
+from recipes.models import Ingredient
+
+MAX_CHAR = '\U0010ffff'
+
+
+class IngredientIndex:
+    '''Отсортированный в памяти процесса список ингредиентов
+    для поиска по началу названия без обращения к базе.
+
+    Индекс помнит версию справочника (CatalogVersion.INGREDIENTS),
+    с которой он построен, и перестраивается, когда запрос приходит
+    с другой версией. Версию берёт вызывающий — та же версия идёт
+    в ETag и Last-Modified ответа, так что под новым ETag старых
+    данных не бывает, а изменения справочника из любого процесса,
+    в том числе load_ingredients, видны всем процессам сразу.
+    Строится при первом поиске в потоке запроса, чьё соединение
+    с базой закрывается вместе с запросом.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _is_fresh(self, index, version):
+        return index is not None and index[0] == (version and version.version)
+
+    def _load(self, version):
+        index = self._index
+        if self._is_fresh(index, version):
+            return index
+        with self._lock:
+            index = self._index
+            if not self._is_fresh(index, version):
+                entries = sorted(
+                    (name.lower(), pk, name, measurement_unit)
+                    for pk, name, measurement_unit in (
+                        Ingredient.objects.values_list(
+                            'id', 'name', 'measurement_unit'
+                        ).iterator()
+                    )
+                )
+                index = (
+                    version and version.version,
+                    [entry[0] for entry in entries],
+                    entries,
+                )
+                self._index = index
+            return index
+
+    def search(self, version, prefix, limit=None):
+        '''Ингредиенты, название которых начинается с prefix:
+        сначала точное совпадение, затем более короткие названия.
+        version — строка CatalogVersion справочника или None.'''
+        return self._search(self._load(version), prefix, limit)
+
+    async def asearch(self, version, prefix, limit=None):
+        '''search для асинхронных представлений: в базу индекс
+        ходит только при перестроении, и то в отдельном потоке.'''
+        index = self._index
+        if not self._is_fresh(index, version):
+            index = await sync_to_async(self._load)(version)
+        return self._search(index, prefix, limit)
+
+    def _search(self, index, prefix, limit):
+        _, keys, entries = index
+        prefix = prefix.lower()
+        matches = entries[
+            bisect_left(keys, prefix):bisect_right(keys, prefix + MAX_CHAR)
+        ]
+
+        def rank(entry):
+            return entry[0] != prefix, len(entry[0]), entry[0], entry[1]
+
+        if limit is None:
+            matches = sorted(matches, key=rank)
+        else:
+            matches = heapq.nsmallest(limit, matches, key=rank)
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in matches
+        ]
+
+
+ingredient_index = IngredientIndex()
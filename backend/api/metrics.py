@@ -0,0 +1,208 @@
+import contextvars
+import json
+import os
+import threading
+import time
+
+from collections import defaultdict
+
+from django.conf import settings
+
+# Границы корзин гистограммы задержек, секунды.
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+SEPARATOR = '\t'
+CONNECTION_GAUGES = {'idle', 'in_use', 'max_size'}
+
+# Счётчики запросов к базе текущего HTTP-запроса. Контекст копируется
+# в потоки sync_to_async, поэтому под ASGI запросы тоже учитываются.
+current_queries = contextvars.ContextVar('current_queries', default=None)
+
+
+class QueryStats:
+    __slots__ = ('count', 'duration')
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    '''execute_wrapper, который ставится на каждое соединение.'''
+    stats = current_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.count += 1
+        stats.duration += time.perf_counter() - started
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Metrics:
+    '''Метрики запросов процесса по маршрутам.
+
+    Если задан METRICS_DIR, процесс раз в METRICS_FLUSH_INTERVAL секунд
+    пишет свои метрики в файл, и /api/metrics/ отдаёт сумму по всем
+    воркерам gunicorn, а не только по ответившему.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flushed_at = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            # (route, method, status) -> число запросов
+            self.requests = defaultdict(int)
+            # (route, method) -> [корзины..., +Inf, сумма]
+            self.latency = defaultdict(
+                lambda: [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            )
+            # (route,) -> [запросов к базе, секунд в базе, байт ответа]
+            self.totals = defaultdict(lambda: [0, 0.0, 0])
+
+    def observe(self, route, method, status, duration, queries, size):
+        bucket = len(LATENCY_BUCKETS)
+        for number, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                bucket = number
+                break
+        with self._lock:
+            self.requests[(route, method, status)] += 1
+            latency = self.latency[(route, method)]
+            latency[bucket] += 1
+            latency[-1] += duration
+            totals = self.totals[(route,)]
+            totals[0] += queries.count
+            totals[1] += queries.duration
+            totals[2] += size
+        if settings.METRICS_DIR:
+            self.maybe_flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                name: {
+                    SEPARATOR.join(map(str, key)): value
+                    for key, value in getattr(self, name).items()
+                }
+                for name in ('requests', 'latency', 'totals')
+            }
+
+    def maybe_flush(self):
+        now = time.monotonic()
+        if now - self._flushed_at < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._flushed_at = now
+        path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        '''Метрики всех процессов из METRICS_DIR или только этого.'''
+        if not settings.METRICS_DIR:
+            return self.snapshot()
+        self._flushed_at = 0
+        self.maybe_flush()
+        merged = {'requests': {}, 'latency': {}, 'totals': {}}
+        for name in os.listdir(settings.METRICS_DIR):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(settings.METRICS_DIR, name)) as file:
+                    snapshot = json.load(file)
+            except (OSError, ValueError):
+                continue
+            for kind, series in snapshot.items():
+                for key, value in series.items():
+                    if key not in merged[kind]:
+                        merged[kind][key] = value
+                    elif isinstance(value, list):
+                        merged[kind][key] = [
+                            a + b for a, b in zip(merged[kind][key], value)
+                        ]
+                    else:
+                        merged[kind][key] += value
+        return merged
+
+
+metrics = Metrics()
+
+
+def _labels(**labels):
+    return ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in labels.items()
+    )
+
+
+def _render_requests(snapshot):
+    yield '# TYPE foodgram_requests_total counter'
+    for key, value in sorted(snapshot['requests'].items()):
+        route, method, status = key.split(SEPARATOR)
+        labels = _labels(route=route, method=method, status=status)
+        yield f'foodgram_requests_total{{{labels}}} {value}'
+    yield '# TYPE foodgram_request_duration_seconds histogram'
+    for key, value in sorted(snapshot['latency'].items()):
+        route, method = key.split(SEPARATOR)
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), value):
+            cumulative += count
+            labels = _labels(route=route, method=method, le=bound)
+            yield (
+                f'foodgram_request_duration_seconds_bucket{{{labels}}} '
+                f'{cumulative}'
+            )
+        labels = _labels(route=route, method=method)
+        yield (
+            f'foodgram_request_duration_seconds_sum{{{labels}}} '
+            f'{value[-1]:.6f}'
+        )
+        yield (
+            f'foodgram_request_duration_seconds_count{{{labels}}} '
+            f'{cumulative}'
+        )
+    for number, name in enumerate((
+        'foodgram_db_queries_total',
+        'foodgram_db_query_seconds_total',
+        'foodgram_response_bytes_total',
+    )):
+        yield f'# TYPE {name} counter'
+        for route, totals in sorted(snapshot['totals'].items()):
+            yield f'{name}{{{_labels(route=route)}}} {totals[number]}'
+
+
+def _render_connections(connections):
+    by_name = defaultdict(list)
+    for alias, stats in connections.items():
+        for name, value in stats.items():
+            by_name[name].append((alias, value))
+    for name, series in sorted(by_name.items()):
+        metric = f'foodgram_db_connections_{name}'
+        if name in CONNECTION_GAUGES:
+            yield f'# TYPE {metric} gauge'
+        else:
+            metric += '_total'
+            yield f'# TYPE {metric} counter'
+        for alias, value in sorted(series):
+            yield f'{metric}{{{_labels(database=alias)}}} {value}'
+
+
+def render_prometheus(snapshot, connections=None):
+    '''Текстовый формат Prometheus 0.0.4. Счётчики соединений —
+    только этого процесса.'''
+    lines = list(_render_requests(snapshot))
+    lines.extend(_render_connections(connections or {}))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,63 @@
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from .metrics import QueryStats, current_queries, metrics
+
+UNMATCHED = '<unmatched>'
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else UNMATCHED
+
+
+def _finish(request, response, started, queries):
+    duration = time.perf_counter() - started
+    if response.streaming:
+        size = int(response.headers.get('Content-Length', 0))
+    else:
+        size = len(response.content)
+    metrics.observe(
+        _route(request),
+        request.method,
+        response.status_code,
+        duration,
+        queries,
+        size,
+    )
+    response.headers['Server-Timing'] = (
+        f'db;dur={queries.duration * 1000:.1f};desc="{queries.count} q", '
+        f'total;dur={duration * 1000:.1f}'
+    )
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    '''Задержка, число и время запросов к базе и размер ответа по
+    маршрутам (имени view из resolver_match) плюс заголовок
+    Server-Timing. У потоковых ответов учитывается только работа
+    до начала отдачи тела.'''
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            queries = QueryStats()
+            token = current_queries.set(queries)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                current_queries.reset(token)
+            return _finish(request, response, started, queries)
+    else:
+        def middleware(request):
+            queries = QueryStats()
+            token = current_queries.set(queries)
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                current_queries.reset(token)
+            return _finish(request, response, started, queries)
+    return middleware
@@ -1,6 +1,57 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+CURSOR_MODE = 'cursor'
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class CustomCursorPagination(CursorPagination):
+    '''Постраничная выдача по ключу: без COUNT(*) и OFFSET,
+    поэтому дальние страницы стоят столько же, сколько первая.'''
+    page_size_query_param = 'limit'
+    page_size = 6
+    ordering = '-id'
+
+
+class CursorModeMixin:
+    '''Курсорная пагинация по запросу клиента: ?pagination=cursor
+    или ?cursor=... из ссылок next/previous.
+
+    Курсор идёт только по cursor_ordering, поэтому параметры из
+    cursor_conflicts, задающие свой порядок, с ним дают ошибку 400.'''
+    cursor_ordering = '-id'
+    cursor_conflicts = ()
+
+    def check_cursor_params(self):
+        params = self.request.query_params
+        conflicts = [
+            name for name in self.cursor_conflicts
+            if params.get(name, '').strip()
+        ]
+        if conflicts:
+            raise ValidationError({
+                name: 'Не сочетается с курсорной пагинацией.'
+                for name in conflicts
+            })
+
+    def use_cursor(self):
+        params = self.request.query_params
+        return (
+            CustomCursorPagination.cursor_query_param in params
+            or params.get('pagination') == CURSOR_MODE
+        )
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.pagination_class is not None and self.use_cursor():
+                self.check_cursor_params()
+                self._paginator = CustomCursorPagination()
+                self._paginator.ordering = self.cursor_ordering
+            else:
+                return super().paginator
+        return self._paginator
@@ -0,0 +1,223 @@
+import abc
+import csv
+
+from itertools import chain, islice
+
+from rest_framework.renderers import BaseRenderer
+
+from .utils import CSV_HEADER, HEADER
+
+
+class ShoppingListRenderer(BaseRenderer, metaclass=abc.ABCMeta):
+    '''Базовый рендерер списка покупок.
+
+    Список отдаётся потоком через stream(); ответы с ошибками
+    view рендерит в JSON.
+    '''
+    charset = 'utf-8'
+
+    @staticmethod
+    def format_row(row):
+        return (
+            f'{row["ingredient__name"]} - {row["total"]}/'
+            f'{row["ingredient__measurement_unit"]}'
+        )
+
+    @abc.abstractmethod
+    def stream(self, rows):
+        '''Части файла для строк списка покупок.'''
+
+
+class TxtRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        yield HEADER
+        separator = ''
+        for row in rows:
+            yield separator + self.format_row(row)
+            separator = '\n'
+
+
+class Echo:
+    '''Псевдо-файл для csv.writer: возвращает строку вместо записи.'''
+
+    def write(self, value):
+        return value
+
+
+class CsvRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(CSV_HEADER)
+        for row in rows:
+            yield writer.writerow((
+                row['ingredient__name'],
+                row['total'],
+                row['ingredient__measurement_unit'],
+            ))
+
+
+class PdfWriter:
+    '''Минимальный потоковый генератор PDF.
+
+    Страницы отдаются по мере заполнения, дерево страниц и таблица
+    xref пишутся в конце. Используется стандартный шрифт Helvetica
+    с кодировкой, в которой кириллица расположена как в cp1251.
+    '''
+    page_width = 595
+    page_height = 842
+    font_size = 11
+    leading = 14
+    margin = 50
+    lines_per_page = (page_height - 2 * margin) // leading
+    cyrillic = dict(
+        [(chr(code), 0xC0 + code - 0x410) for code in range(0x410, 0x450)]
+        + [('Ё', 0xA8), ('ё', 0xB8)]
+    )
+
+    def __init__(self):
+        self.position = 0
+        self.offsets = {}
+        self.pages = []
+        self.next_number = 5
+
+    def _raw(self, data):
+        self.position += len(data)
+        return data
+
+    def _object(self, number, body):
+        self.offsets[number] = self.position
+        return self._raw(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def _reserve(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def _encode(self, line):
+        encoded = bytearray()
+        for char in line:
+            if char in self.cyrillic:
+                encoded.append(self.cyrillic[char])
+            elif ord(char) < 128:
+                encoded.append(ord(char))
+            else:
+                encoded.append(ord('?'))
+        return (
+            bytes(encoded)
+            .replace(b'\\', b'\\\\')
+            .replace(b'(', b'\\(')
+            .replace(b')', b'\\)')
+        )
+
+    @staticmethod
+    def _afii(code):
+        '''Номер глифа кириллической буквы А-я в Adobe Glyph List.'''
+        number = 10017 + code - 0x410
+        if code >= 0x430:
+            number += 16
+        if code in (*range(0x416, 0x430), *range(0x436, 0x450)):
+            number += 1
+        return number
+
+    def _to_unicode(self):
+        cmap = (
+            b'/CIDInit /ProcSet findresource begin 12 dict begin begincmap\n'
+            b'/CMapName /Foodgram-Cyrillic def /CMapType 2 def\n'
+            b'1 begincodespacerange <00> <FF> endcodespacerange\n'
+            b'2 beginbfrange <20> <7E> <0020> <C0> <FF> <0410> endbfrange\n'
+            b'2 beginbfchar <A8> <0401> <B8> <0451> endbfchar\n'
+            b'endcmap CMapName currentdict /CMap defineresource pop end end'
+        )
+        return b'<< /Length %d >>\nstream\n%s\nendstream' % (len(cmap), cmap)
+
+    def header(self):
+        differences = b' '.join(
+            [b'168 /afii10023', b'184 /afii10071', b'192']
+            + [b'/afii%d' % self._afii(code) for code in range(0x410, 0x450)]
+        )
+        return b''.join((
+            self._raw(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'),
+            self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>'),
+            self._object(
+                3,
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+                b'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+                b'/Differences [%s] >> /ToUnicode 4 0 R >>' % differences
+            ),
+            self._object(4, self._to_unicode()),
+        ))
+
+    def page(self, lines):
+        content = b''.join(chain(
+            [b'BT /F1 %d Tf %d TL %d %d Td\n' % (
+                self.font_size,
+                self.leading,
+                self.margin,
+                self.page_height - self.margin,
+            )],
+            (b'(%s) Tj T*\n' % self._encode(line) for line in lines),
+            [b'ET'],
+        ))
+        content_number = self._reserve()
+        page_number = self._reserve()
+        self.pages.append(page_number)
+        return b''.join((
+            self._object(
+                content_number,
+                b'<< /Length %d >>\nstream\n%s\nendstream' % (
+                    len(content), content
+                ),
+            ),
+            self._object(
+                page_number,
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+                b'/Resources << /Font << /F1 3 0 R >> >> '
+                b'/Contents %d 0 R >>' % (
+                    self.page_width, self.page_height, content_number
+                ),
+            ),
+        ))
+
+    def trailer(self):
+        kids = b' '.join(b'%d 0 R' % number for number in self.pages)
+        pages = self._object(
+            2,
+            b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+                kids, len(self.pages)
+            ),
+        )
+        xref_position = self.position
+        size = self.next_number
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n' % size]
+        xref.extend(
+            b'%010d 00000 n \n' % self.offsets[number]
+            for number in range(1, size)
+        )
+        return pages + b''.join(xref) + (
+            b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n'
+            % (size, xref_position)
+        )
+
+
+class PdfRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    def stream(self, rows):
+        writer = PdfWriter()
+        yield writer.header()
+        lines = chain(
+            HEADER.splitlines(), (self.format_row(row) for row in rows)
+        )
+        page_lines = list(islice(lines, writer.lines_per_page))
+        while page_lines:
+            yield writer.page(page_lines)
+            page_lines = list(islice(lines, writer.lines_per_page))
+        yield writer.trailer()
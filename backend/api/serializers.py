@@ -1,11 +1,28 @@
+import json
+
 from django.db import transaction
-from django.shortcuts import get_object_or_404
-from drf_extra_fields.fields import Base64ImageField
+from recipes.images import forget_variants, schedule_variants
 from recipes.models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, ShopingCart, Tag,
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShopingCart,
+    ShopingCartIngredient, Tag,
 )
+from recipes.search import index_recipes
 from rest_framework import serializers, status
-from users.serializers import CustomUserSerializer
+from users.serializers import CustomUserSerializer, is_subscribed
+
+from .fields import (
+    Base64ImageField, ImageVariantsField, url_builder, variant_urls,
+)
+
+
+def user_flag(request, recipe, name, related_name):
+    """Аннотация with_user_flags() или, если её нет, запрос к базе."""
+    if hasattr(recipe, name):
+        return getattr(recipe, name)
+    user = request.user
+    if user.is_anonymous:
+        return False
+    return getattr(user, related_name).filter(recipe=recipe).exists()
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -35,6 +52,7 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
 
 class RecipeSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
     is_favorited = serializers.SerializerMethodField()
@@ -56,87 +74,235 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.favorites.filter(recipe=obj).exists()
+        return user_flag(
+            self.context.get('request'), obj, 'is_favorited', 'favorites'
+        )
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.shopingcarts.filter(recipe=obj).exists()
+        return user_flag(
+            self.context.get('request'),
+            obj,
+            'is_in_shopping_cart',
+            'shopingcarts',
+        )
 
     def get_ingredients(self, obj):
         ingredients = IngredientInRecipeSerializer.objects.filter(recipe=obj)
         return IngredientInRecipeSerializer(ingredients, many=True).data
 
     def validate(self, data):
-        ingredients = self.initial_data['ingredients']
-        ingredients_list = []
+        data['ingredients'] = self._validate_ingredients(
+            self._get_initial_list('ingredients')
+        )
+        data['tags'] = self._validate_tags(self._get_initial_list('tags'))
+        return data
+
+    def _get_initial_list(self, name):
+        """Список из JSON или из полей multipart/form-data, где он
+        передаётся JSON-строкой или повторяющимися полями."""
+        if not hasattr(self.initial_data, 'getlist'):
+            return self.initial_data.get(name)
+        items = []
+        for value in self.initial_data.getlist(name):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+            items.extend(value if isinstance(value, list) else [value])
+        return items
+
+    def _validate_ingredients(self, ingredients):
         if not ingredients:
             raise serializers.ValidationError(
                 'Необходимо указать как минимум один ингредиент'
             )
-        for item in ingredients:
-            if int(item['amount']) < 1:
-                raise serializers.ValidationError(
-                    'Минимальное количество ингредиента меньше 1'
-                )
-            ingredient = get_object_or_404(
-                Ingredient, id=item['id']
+        try:
+            ingredients = [
+                {'id': int(item['id']), 'amount': int(item['amount'])}
+                for item in ingredients
+            ]
+        except (KeyError, TypeError, ValueError):
+            raise serializers.ValidationError(
+                'Для ингредиента нужно указать id и количество'
             )
-            if ingredient in ingredients_list:
-                raise serializers.ValidationError(
-                    'Указано несколько одинаковых ингредиентов'
-                )
-            ingredients_list.append(ingredient)
-        data['ingredients'] = ingredients
-        return data
+        if any(item['amount'] < 1 for item in ingredients):
+            raise serializers.ValidationError(
+                'Минимальное количество ингредиента меньше 1'
+            )
+        ids = {item['id'] for item in ingredients}
+        if len(ids) != len(ingredients):
+            raise serializers.ValidationError(
+                'Указано несколько одинаковых ингредиентов'
+            )
+        if Ingredient.objects.filter(id__in=ids).count() != len(ids):
+            raise serializers.ValidationError(
+                'Указан несуществующий ингредиент'
+            )
+        return ingredients
 
-    def validate_tags(self, data):
-        tags = self.initial_data['tags']
+    def _validate_tags(self, tags):
         if not tags:
             raise serializers.ValidationError(
                 'Необходимо указать как минимум один тег'
             )
-        lst = []
-        for tag in tags:
-            lst.append(tag)
-        data['tags'] = tags
-        return data
+        try:
+            tags = [int(tag) for tag in tags]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError('Неверный id тега')
+        ids = set(tags)
+        if len(ids) != len(tags):
+            raise serializers.ValidationError(
+                'Указано несколько одинаковых тегов'
+            )
+        if Tag.objects.filter(id__in=ids).count() != len(ids):
+            raise serializers.ValidationError('Указан несуществующий тег')
+        return tags
 
     def _add_elements_to_recipe(self, ingredients, recipe):
-        for ingredient in ingredients:
-            IngredientInRecipe.objects.create(
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
                 recipe=recipe,
-                ingredient_id=ingredient.get('id'),
+                ingredient_id=ingredient['id'],
                 amount=ingredient['amount'],
             )
+            for ingredient in ingredients
+        )
 
     @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
+        tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
-        tags = self.initial_data.get('tags')
         recipe.tags.set(tags)
         self._add_elements_to_recipe(ingredients, recipe)
+        index_recipes([recipe.id])
+        schedule_variants(recipe)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        tags = self.initial_data.get('tags')
-        instance.tags.set(tags)
-        IngredientInRecipe.objects.filter(recipe=instance).all().delete()
-        ingredients = validated_data.pop('ingredients')
-        self._add_elements_to_recipe(ingredients, instance)
-        return super().update(instance, validated_data)
+        self._update_tags(instance, set(validated_data.pop('tags')))
+        self._update_ingredients(instance, {
+            ingredient['id']: ingredient['amount']
+            for ingredient in validated_data.pop('ingredients')
+        })
+        if 'image' in validated_data:
+            image, variants = instance.image.name, instance.image_variants
+            validated_data['image_variants'] = {}
+        instance = super().update(instance, validated_data)
+        index_recipes([instance.id])
+        if 'image' in validated_data:
+            if instance.image.name != image:
+                forget_variants(variants)
+            schedule_variants(instance)
+        return instance
+
+    def _update_tags(self, instance, tags):
+        current = {tag.id for tag in instance.tags.all()}
+        if current - tags:
+            instance.tags.remove(*(current - tags))
+        if tags - current:
+            instance.tags.add(*(tags - current))
+
+    def _update_ingredients(self, instance, amounts):
+        """Изменяет только добавленные, удалённые и изменённые строки.
+
+        Удалённые строки вычитаются из списков покупок сигналом
+        post_delete, а bulk_create и bulk_update сигналов не шлют,
+        поэтому их изменения переносятся в списки здесь.
+        """
+        current = {
+            row.ingredient_id: row for row in instance.ingredientrecipes.all()
+        }
+        deltas = {}
+        to_create, to_update = [], []
+        for ingredient_id, amount in amounts.items():
+            row = current.get(ingredient_id)
+            if row is None:
+                to_create.append({'id': ingredient_id, 'amount': amount})
+                deltas[ingredient_id] = amount
+            elif row.amount != amount:
+                deltas[ingredient_id] = amount - row.amount
+                row.amount = amount
+                to_update.append(row)
+        removed = [
+            current[ingredient_id].pk
+            for ingredient_id in current if ingredient_id not in amounts
+        ]
+        if removed:
+            IngredientInRecipe.objects.filter(pk__in=removed).delete()
+        if not deltas:
+            return
+        IngredientInRecipe.objects.bulk_update(to_update, ['amount'])
+        self._add_elements_to_recipe(to_create, instance)
+        ShopingCartIngredient.objects.apply(
+            instance.shopingcarts.values_list('user_id', flat=True), deltas
+        )
+
+
+class RecipeReadSerializer(serializers.BaseSerializer):
+    """Рецепт для list и retrieve: тот же JSON, что у RecipeSerializer,
+    но словарь собирается прямо из атрибутов, без полей DRF и их
+    to_representation на каждое значение.
+
+    Ждёт рецепт из Recipe.objects.with_related().with_user_flags()
+    или load_recipes(); поля здесь и в RecipeSerializer меняются вместе.
+    """
+
+    def to_representation(self, recipe):
+        request = self.context.get('request')
+        build_url = url_builder(request)
+        author = recipe.author
+        return {
+            'id': recipe.id,
+            'tags': [
+                {
+                    'id': tag.id,
+                    'name': tag.name,
+                    'color': tag.color,
+                    'slug': tag.slug,
+                }
+                for tag in recipe.tags.all()
+            ],
+            'author': {
+                'id': author.id,
+                'email': author.email,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'is_subscribed': is_subscribed(request, author),
+            },
+            'ingredients': [
+                self.ingredient(item.ingredient, item.amount)
+                for item in recipe.ingredientrecipes.all()
+            ],
+            'is_favorited': user_flag(
+                request, recipe, 'is_favorited', 'favorites'
+            ),
+            'is_in_shopping_cart': user_flag(
+                request, recipe, 'is_in_shopping_cart', 'shopingcarts'
+            ),
+            'name': recipe.name,
+            'image': build_url(recipe.image.url) if recipe.image else None,
+            'image_variants': variant_urls(recipe.image_variants, build_url),
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+
+    @staticmethod
+    def ingredient(ingredient, amount):
+        return {
+            'id': ingredient.id,
+            'name': ingredient.name,
+            'measurement_unit': ingredient.measurement_unit,
+            'amount': amount,
+        }
 
 
 class FavoriteSerializer(RecipeSerializer):
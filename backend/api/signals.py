@@ -0,0 +1,98 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete,
+)
+from django.dispatch import receiver
+from foodgram.db.pool import count_connect
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShopingCart, Tag,
+)
+from users.models import User
+
+from .cache import invalidate, invalidate_ordering, invalidate_recipes
+from .metrics import install_query_recorder
+from .tag_index import tag_index
+
+# Поля пользователя, которые видны в авторе рецепта.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_index(sender, **kwargs):
+    tag_index.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_catalog(sender, **kwargs):
+    invalidate(catalog=True)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(pre_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    invalidate(
+        author_ids=[instance.author_id],
+        tag_slugs=instance.tags.values_list('slug', flat=True),
+    )
+
+
+@receiver(post_save, sender=IngredientInRecipe)
+@receiver(post_delete, sender=IngredientInRecipe)
+def invalidate_recipe_ingredients(sender, instance, **kwargs):
+    invalidate_recipes([instance.recipe_id])
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        invalidate_recipes(pk_set or instance.recipes.values_list(
+            'pk', flat=True
+        ))
+        return
+    tags = instance.tags.all()
+    if pk_set is not None:
+        tags = Tag.objects.filter(pk__in=pk_set)
+    invalidate(
+        author_ids=[instance.author_id],
+        tag_slugs=tags.values_list('slug', flat=True),
+    )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShopingCart)
+@receiver(post_delete, sender=ShopingCart)
+def invalidate_recipe_counters(sender, **kwargs):
+    '''Счётчики избранного и корзин задают порядок популярных.'''
+    invalidate_ordering()
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, created, update_fields, **kwargs):
+    '''Выдачи с рецептами пользователя, если изменились поля автора;
+    сохранение одного last_login при входе их не трогает.'''
+    if created or update_fields and not AUTHOR_FIELDS & set(update_fields):
+        return
+    invalidate(
+        author_ids=[instance.pk],
+        tag_slugs=Tag.objects.filter(
+            recipes__author=instance
+        ).values_list('slug', flat=True).distinct(),
+    )
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    count_connect(connection.alias)
+
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
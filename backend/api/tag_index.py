@@ -0,0 +1,46 @@
+import threading
+import time
+
+from django.conf import settings
+from recipes.models import Tag
+
+
+class TagIndex:
+    '''Соответствие слагов тегов их id в памяти процесса.
+
+    Сбрасывается сигналами при записи в таблицу тегов; незнакомый слаг
+    перечитывает таблицу сразу, остальные изменения других процессов
+    подхватываются по истечении TAG_INDEX_TTL секунд.
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None
+        self._built_at = 0
+
+    def invalidate(self):
+        self._ids = None
+
+    def _is_fresh(self, ids):
+        return ids is not None and (
+            time.monotonic() - self._built_at < settings.TAG_INDEX_TTL
+        )
+
+    def _load(self, force=False):
+        ids = self._ids
+        if not force and self._is_fresh(ids):
+            return ids
+        with self._lock:
+            if force or not self._is_fresh(self._ids):
+                self._ids = dict(Tag.objects.values_list('slug', 'id'))
+                self._built_at = time.monotonic()
+            return self._ids
+
+    def get_id(self, slug):
+        ids = self._load()
+        if slug not in ids:
+            ids = self._load(force=True)
+        return ids.get(slug)
+
+
+tag_index = TagIndex()
@@ -1,7 +1,12 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientViewSet, RecipeViewSet, TagViewSet
+from . import async_views
+from .views import (
+    DatabaseStatsView, IngredientViewSet, MetricsView, RecipeViewSet,
+    TagViewSet,
+)
 
 app_name = 'api'
 
@@ -11,5 +16,33 @@ router.register('tags', TagViewSet, basename="tags")
 router.register('ingredients', IngredientViewSet, basename="ingredients")
 
 urlpatterns = [
+    path('stats/db/', DatabaseStatsView.as_view(), name='stats-db'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
 ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path(
+            'recipes/', async_views.recipe_list_view, name='recipes-list'
+        ),
+        path(
+            'recipes/<int:pk>/',
+            async_views.recipe_detail_view,
+            name='recipes-detail',
+        ),
+        path('tags/', async_views.tag_list_view, name='tags-list'),
+        path(
+            'tags/<int:pk>/', async_views.tag_detail_view, name='tags-detail'
+        ),
+        path(
+            'ingredients/',
+            async_views.ingredient_list_view,
+            name='ingredients-list',
+        ),
+        path(
+            'ingredients/<int:pk>/',
+            async_views.ingredient_detail_view,
+            name='ingredients-detail',
+        ),
+    ] + urlpatterns
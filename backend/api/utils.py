@@ -1,2 +1,4 @@
-FILENAME = "shoping_list.txt"
+FILENAME = "shoping_list"
 HEADER = 'Список покупок:\n\nНаименование - Кол-во/Ед.изм.\n'
+CSV_HEADER = ('Наименование', 'Кол-во', 'Ед.изм.')
+EXPORT_CHUNK_SIZE = 500
@@ -1,79 +1,157 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.decorators import method_decorator
 from django_filters.rest_framework import DjangoFilterBackend
+from foodgram.db.pool import connection_stats
 from recipes.models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, ShopingCart, Tag,
+    CatalogVersion, Favorite, Ingredient, Recipe, ShopingCart, Tag,
 )
-from rest_framework import filters, status, viewsets
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from users.serializers import YaRecipeSerializer
 
-from .filters import IngredientSearchFilter, RecipeFilter
-from .pagination import CustomPagination
+from .cache import get_anonymous_list
+from .conditional import catalog_condition, catalog_version, recipe_condition
+from .filters import IngredientSearchFilter, RecipeFilter, RecipeSearchFilter
+from .ingredient_index import ingredient_index
+from .metrics import metrics, render_prometheus
+from .pagination import CursorModeMixin, CustomPagination
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from .serializers import IngredientSerializer, RecipeSerializer, TagSerializer
-from .utils import FILENAME, HEADER
+from .renderers import CsvRenderer, PdfRenderer, TxtRenderer
+from .serializers import (
+    IngredientSerializer, RecipeReadSerializer, RecipeSerializer,
+    TagSerializer,
+)
+from .utils import EXPORT_CHUNK_SIZE, FILENAME
 
 
+@method_decorator(catalog_condition(CatalogVersion.TAGS), name='list')
+@method_decorator(catalog_condition(CatalogVersion.TAGS), name='retrieve')
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
 
+@method_decorator(
+    catalog_condition(CatalogVersion.INGREDIENTS), name='list'
+)
+@method_decorator(
+    catalog_condition(CatalogVersion.INGREDIENTS), name='retrieve'
+)
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     filter_backends = (DjangoFilterBackend, IngredientSearchFilter)
     search_fields = ('^name',)
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get('limit', '')
+        return Response(ingredient_index.search(
+            catalog_version(request, CatalogVersion.INGREDIENTS),
+            name,
+            int(limit) if limit.isdigit() else None,
+        ))
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+@method_decorator(recipe_condition, name='retrieve')
+class RecipeViewSet(CursorModeMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     pagination_class = CustomPagination
     permission_classes = (IsAuthorOrReadOnly, )
-    filter_backends = (DjangoFilterBackend, filters.SearchFilter)
+    filter_backends = (DjangoFilterBackend, RecipeSearchFilter)
     filterset_class = RecipeFilter
+    cursor_conflicts = (RecipeSearchFilter.search_param, 'ordering')
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().list(request, *args, **kwargs)
+        return Response(get_anonymous_list(
+            request, lambda: super(RecipeViewSet, self).list(
+                request, *args, **kwargs
+            ).data
+        ))
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return RecipeReadSerializer
+        return RecipeSerializer
+
+    def get_queryset(self):
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Ошибки списка покупок (401, 406, 400 для пустой корзины)
+        # отдаются в JSON, а не рендерером файла.
+        if (
+            self.action == 'download_shopping_cart'
+            and isinstance(response, Response)
+            and not status.is_success(response.status_code)
+        ):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
+
+    def perform_update(self, serializer):
+        serializer.save()
+        serializer.instance = self.get_queryset().get(
+            pk=serializer.instance.pk
+        )
 
     @action(
         methods=['get'],
         detail=False,
-        permission_classes=[IsAuthenticated]
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[TxtRenderer, CsvRenderer, PdfRenderer],
     )
     def download_shopping_cart(self, request):
         user = request.user
         if not user.shopingcarts.exists():
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'errors': 'Список покупок пуст'
+            }, status=status.HTTP_400_BAD_REQUEST)
 
         ingredients = (
-            IngredientInRecipe.objects.filter(
-                recipe__shopingcarts__user=user
-            )
+            user.shopingcart_ingredients
+            .annotate(total=F('amount'))
             .values(
                 'ingredient__name',
                 'ingredient__measurement_unit',
+                'total',
             )
             .order_by('ingredient__name')
-            .annotate(total=Sum('amount'))
         )
-        shoping_list_content = HEADER
-        shoping_list_content += '\n'.join([
-            f'{ingredient["ingredient__name"]} - {ingredient["total"]}/'
-            f'{ingredient["ingredient__measurement_unit"]}'
-            for ingredient in ingredients
-        ])
-        response = HttpResponse(
-            shoping_list_content,
-            content_type='text/plain'
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(ingredients.iterator(
+                chunk_size=EXPORT_CHUNK_SIZE
+            )),
+            content_type=(
+                f'{renderer.media_type}; charset={renderer.charset}'
+                if renderer.charset else renderer.media_type
+            ),
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename={FILENAME}.{renderer.format}'
         )
-        response['Content-Disposition'] = f'attachment; filename={FILENAME}'
         return response
 
     @action(
@@ -106,7 +184,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 'errors': 'Рецепт уже добавлен в список'
             }, status=status.HTTP_400_BAD_REQUEST)
         recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
+        with transaction.atomic():
+            model.objects.create(user=user, recipe=recipe)
         serializer = YaRecipeSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -118,3 +197,22 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return Response({
             'errors': 'Рецепт уже удален'
         }, status=status.HTTP_400_BAD_REQUEST)
+
+
+class DatabaseStatsView(APIView):
+    '''Счётчики соединений с базой в этом процессе.'''
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(connection_stats())
+
+
+class MetricsView(APIView):
+    '''Метрики запросов и соединений в формате Prometheus.'''
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus(metrics.collect(), connection_stats()),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
@@ -0,0 +1,153 @@
+import os
+import threading
+import time
+
+from collections import Counter, deque
+
+from django.db import DatabaseError
+
+
+class PoolTimeout(DatabaseError):
+    pass
+
+
+class ConnectionPool:
+    '''Пул соединений с базой внутри процесса.
+
+    Django берёт соединение из пула при первом запросе к базе
+    и возвращает его при закрытии, то есть в конце HTTP-запроса.
+    Соединения дольше max_idle без дела или старше max_lifetime
+    закрываются при следующей выдаче, при health_checks перед выдачей
+    соединение проверяется запросом к базе.
+    '''
+
+    def __init__(self, is_usable, reset, max_size=10, timeout=10,
+                 max_idle=300, max_lifetime=3600, health_checks=True):
+        self.is_usable = is_usable
+        self.reset = reset
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_checks = health_checks
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        # (соединение, когда создано, когда вернулось в пул)
+        self._idle = deque()
+        self._created_at = {}
+        self.counters = Counter()
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _discard(self, connection):
+        self._created_at.pop(id(connection), None)
+        self._count('discarded')
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _take_idle(self):
+        '''Последнее вернувшееся живое соединение или None.'''
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None
+                connection, created_at, released_at = self._idle.pop()
+            now = time.monotonic()
+            if (
+                now - released_at > self.max_idle
+                or now - created_at > self.max_lifetime
+                or (self.health_checks and not self.is_usable(connection))
+            ):
+                self._discard(connection)
+                continue
+            return connection
+
+    def acquire(self, connect):
+        '''Свободное соединение из пула или новое от connect().'''
+        started = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            self._count('waits')
+            if not self._slots.acquire(timeout=self.timeout):
+                self._count('timeouts')
+                raise PoolTimeout(
+                    f'Нет свободного соединения за {self.timeout} с'
+                )
+        try:
+            connection = self._take_idle()
+            if connection is None:
+                connection = connect()
+                self._created_at[id(connection)] = time.monotonic()
+                self._count('created')
+            else:
+                self._count('reused')
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.counters['wait_seconds'] += time.monotonic() - started
+        return connection
+
+    def release(self, connection):
+        try:
+            created_at = self._created_at.get(id(connection))
+            if created_at is None or not self.reset(connection):
+                self._discard(connection)
+                return
+            with self._lock:
+                self._idle.append(
+                    (connection, created_at, time.monotonic())
+                )
+        finally:
+            self._slots.release()
+
+    def clear(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            idle = len(self._idle)
+        stats.update(
+            max_size=self.max_size,
+            idle=idle,
+            in_use=len(self._created_at) - idle,
+        )
+        return stats
+
+
+pools = {}
+_connects = Counter()
+_connects_lock = threading.Lock()
+
+
+def count_connect(alias):
+    with _connects_lock:
+        _connects[alias] += 1
+
+
+def connection_stats():
+    '''Счётчики соединений по алиасам баз: connects — сколько раз Django
+    открывал соединение (с пулом — брал его из пула), остальное —
+    счётчики пула, если он включён.'''
+    with _connects_lock:
+        stats = {alias: {'connects': count} for alias, count in
+                 _connects.items()}
+    for alias, pool in list(pools.items()):
+        stats.setdefault(alias, {}).update(pool.stats())
+    return stats
+
+
+def _forget_pools():
+    # Соединения родителя после fork не принадлежат ребёнку.
+    pools.clear()
+    _connects.clear()
+
+
+os.register_at_fork(after_in_child=_forget_pools)
@@ -0,0 +1,81 @@
+import threading
+
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from ..pool import ConnectionPool, pools
+
+_pools_lock = threading.Lock()
+
+
+def _reset(connection):
+    '''Готовит соединение к возврату в пул: откатывает незавершённую
+    транзакцию. False — соединение сломано, его надо закрыть.'''
+    Database = base.Database
+    if connection.closed:
+        return False
+    status = connection.info.transaction_status
+    if status == Database.extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != Database.extensions.TRANSACTION_STATUS_IDLE:
+        try:
+            connection.rollback()
+        except Database.Error:
+            return False
+    return True
+
+
+def _is_usable(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        # Без autocommit проверка открыла транзакцию.
+        return _reset(connection)
+    except base.Database.Error:
+        return False
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    '''Postgres с пулом соединений процесса: close() возвращает
+    соединение в пул, следующий запрос получает его без нового
+    TCP-подключения и авторизации.
+
+    Параметры пула берутся из ключа POOL настроек базы.
+    '''
+
+    def get_pool(self):
+        pool = pools.get(self.alias)
+        if pool is None:
+            with _pools_lock:
+                pool = pools.get(self.alias)
+                if pool is None:
+                    pool = ConnectionPool(
+                        is_usable=_is_usable,
+                        reset=_reset,
+                        health_checks=self.settings_dict[
+                            'CONN_HEALTH_CHECKS'
+                        ],
+                        **self.settings_dict.get('POOL', {}),
+                    )
+                    pools[self.alias] = pool
+        return pool
+
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level'
+        )
+        # Для нового соединения это уже сделал родительский метод.
+        self.isolation_level = (
+            IsolationLevel.READ_COMMITTED if isolation_level is None
+            else IsolationLevel(isolation_level)
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            pools[self.alias].release(self.connection)
@@ -12,8 +12,11 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 import os
 
+from datetime import timedelta
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -51,6 +54,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -99,9 +103,46 @@ else:
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 10)),
+            },
         }
     }
+    # DB_POOL_MAX_SIZE > 0 включает пул соединений процесса
+    # (foodgram.db.postgresql): соединение возвращается в пул в конце
+    # запроса, поэтому CONN_MAX_AGE с пулом не нужен. Без пула под ASGI
+    # CONN_MAX_AGE должен быть 0: asgi.py выставляет это по умолчанию.
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+    if DB_POOL_MAX_SIZE:
+        DATABASES['default'].update(
+            ENGINE='foodgram.db.postgresql',
+            POOL={
+                'max_size': DB_POOL_MAX_SIZE,
+                'timeout': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+                'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+                'max_lifetime': float(
+                    os.getenv('DB_POOL_MAX_LIFETIME', 3600)
+                ),
+            },
+        )
+
+DATABASES['default'].update(
+    CONN_MAX_AGE=(
+        0 if DATABASES['default'].get('POOL')
+        else int(os.getenv('DB_CONN_MAX_AGE', 60))
+    ),
+    CONN_HEALTH_CHECKS=os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+)
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -150,14 +191,53 @@ MEDIA_ROOT = BASE_DIR / 'media'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Пользователь по токену для запросов на чтение берётся из кеша
+# AUTH_TOKEN_CACHE (пустое значение — без кеша). Выход и смена пароля
+# сбрасывают кеш, поэтому он должен быть общим для всех процессов:
+# по умолчанию токены кешируются, только если кеш default не
+# LocMemCache, а LocMemCache при нескольких воркерах gunicorn запрещён.
+# Массовые queryset.update() у пользователей сигналов не шлют и кеш
+# не сбрасывают: токены остаются действительными до
+# AUTH_TOKEN_CACHE_TIMEOUT секунд.
+LOCMEM_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+AUTH_TOKEN_CACHE = os.getenv(
+    'AUTH_TOKEN_CACHE',
+    '' if CACHES['default']['BACKEND'] == LOCMEM_CACHE else 'default',
+)
+if (
+    AUTH_TOKEN_CACHE
+    and CACHES[AUTH_TOKEN_CACHE]['BACKEND'] == LOCMEM_CACHE
+    and int(os.getenv('GUNICORN_WORKERS', 1)) > 1
+):
+    raise ImproperlyConfigured(
+        'AUTH_TOKEN_CACHE с LocMemCache не сбрасывается в других '
+        'воркерах: задайте общий CACHE_BACKEND или AUTH_TOKEN_CACHE='
+    )
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+# AUTH_JWT=True добавляет вход по JWT: auth/jwt/create/ и
+# auth/jwt/refresh/, заголовок Authorization: Bearer.
+AUTH_JWT = os.getenv('AUTH_JWT', 'False') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ],
+        'users.authentication.CachedTokenAuthentication',
+    ] + (
+        ['users.authentication.ClaimsJWTAuthentication'] if AUTH_JWT else []
+    ),
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 5))
+    ),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 1))
+    ),
+    'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
 DJOSER = {
@@ -174,6 +254,29 @@ DJOSER = {
     'HIDE_USERS': False,
 }
 
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024)
+)
+
+IMAGE_VARIANT_WORKERS = int(os.getenv('IMAGE_VARIANT_WORKERS', 2))
+
+RECIPE_LIST_CACHE_TIMEOUT = int(os.getenv('RECIPE_LIST_CACHE_TIMEOUT', 300))
+RECIPE_LIST_CACHE_LOCK_TIMEOUT = int(
+    os.getenv('RECIPE_LIST_CACHE_LOCK_TIMEOUT', 10)
+)
+
+TAG_INDEX_TTL = int(os.getenv('TAG_INDEX_TTL', 300))
+
+# Каталог, через который воркеры gunicorn делятся метриками для
+# /api/metrics/; без него каждый воркер отдаёт только свои.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', 'russian')
+
+# Асинхронные представления для чтения; asgi.py включает их по умолчанию.
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'False') == 'True'
+
 CORS_URLS_REGEX = r'^/api/.*$'
 CORS_ALLOWED_ORIGINS = [
     'http://localhost',
@@ -0,0 +1,15 @@
+import os
+
+# SERVER_MODE=asgi запускает foodgram.asgi на воркерах uvicorn:
+# чтение рецептов, тегов, ингредиентов и подписок идёт через
+# асинхронные представления, остальное — через DRF в пуле потоков.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
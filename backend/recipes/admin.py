@@ -2,8 +2,10 @@ from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
 
 from .models import (
-    Favorite, Ingredient, IngredientInRecipe, Recipe, ShopingCart, Tag,
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShopingCart,
+    ShopingCartIngredient, Tag,
 )
+from .search import index_recipes
 
 
 class RecipeAdmin(admin.ModelAdmin):
@@ -15,6 +17,10 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('author', 'name', 'tags')
     empty_value_display = '-пусто-'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        index_recipes([form.instance.id])
+
 
 class TagAdmin(admin.ModelAdmin):
     list_display = (
@@ -43,9 +49,15 @@ class ShopingCartAdmin(admin.ModelAdmin):
     pass
 
 
+class ShopingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_filter = ('user',)
+
+
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
 admin.site.register(Favorite, FavoriteRecipeAdmin)
 admin.site.register(ShopingCart, ShopingCartAdmin)
+admin.site.register(ShopingCartIngredient, ShopingCartIngredientAdmin)
@@ -0,0 +1,111 @@
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from api.cache import invalidate_recipes
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANTS_DIR = 'images/variants'
+
+_executor = None
+
+
+def variant_name(name, variant, extension):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return f'{VARIANTS_DIR}/{stem}_{variant}.{extension}'
+
+
+def generate_variants(name):
+    '''Создаёт уменьшенные копии картинки в WebP и JPEG.
+
+    Возвращает {вариант: {формат: имя файла в хранилище}}.
+    '''
+    with default_storage.open(name, 'rb') as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    variants = {}
+    for variant, size in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail(size, Image.LANCZOS)
+        variants[variant] = {}
+        for extension, (image_format, options) in FORMATS.items():
+            target = variant_name(name, variant, extension)
+            if not default_storage.exists(target):
+                converted = image
+                if image_format == 'JPEG' and image.mode != 'RGB':
+                    converted = image.convert('RGB')
+                buffer = BytesIO()
+                converted.save(buffer, image_format, **options)
+                default_storage.save(target, ContentFile(buffer.getvalue()))
+            variants[variant][extension] = target
+    return variants
+
+
+def delete_variants(variants):
+    '''Удаляет из хранилища файлы, перечисленные в image_variants.'''
+    for formats in variants.values():
+        for name in formats.values():
+            default_storage.delete(name)
+
+
+def forget_variants(variants):
+    '''Удаляет копии после коммита: при откате они ещё нужны.'''
+    if variants:
+        transaction.on_commit(lambda: delete_variants(variants))
+
+
+def process_recipe_image(recipe_id, name):
+    try:
+        variants = generate_variants(name)
+        if not Recipe.objects.filter(pk=recipe_id, image=name).update(
+            image_variants=variants,
+            updated_at=timezone.now(),
+        ):
+            # Пока делались копии, картинку сменили или рецепт удалили.
+            delete_variants(variants)
+            return
+        invalidate_recipes([recipe_id])
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', name)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_VARIANT_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+    return _executor
+
+
+def schedule_variants(recipe):
+    '''Ставит обработку картинки рецепта в фоновый пул после коммита.'''
+    if not recipe.image:
+        return
+    recipe_id, name = recipe.pk, recipe.image.name
+    transaction.on_commit(
+        lambda: get_executor().submit(process_recipe_image, recipe_id, name)
+    )
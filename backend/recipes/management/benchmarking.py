@@ -0,0 +1,89 @@
+import math
+import threading
+import time
+
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import urlsplit
+
+from django.core.management import CommandError
+
+
+def percentile(values, share):
+    '''Значение, не меньше которого share доли values; 0 для пустых.'''
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[max(0, math.ceil(share * len(values)) - 1)]
+
+
+class HTTPLoad:
+    '''Нагрузка на запущенный сервер: потоки до истечения времени шлют
+    запросы, каждый через своё keep-alive соединение.'''
+
+    def __init__(self, base_url):
+        self.url = urlsplit(base_url or '')
+        if self.url.scheme not in ('http', 'https') or not self.url.hostname:
+            raise CommandError('Ожидается адрес вида http://host:port')
+        self.prefix = self.url.path.rstrip('/')
+
+    def connect(self):
+        connection_class = (
+            HTTPSConnection if self.url.scheme == 'https' else HTTPConnection
+        )
+        return connection_class(self.url.hostname, self.url.port, timeout=30)
+
+    def send(self, connection, method, target, headers, body=None):
+        '''Код ответа (None при сетевой ошибке) и задержка в секундах.
+        После ошибки возвращается новое соединение.'''
+        started = time.perf_counter()
+        try:
+            connection.request(
+                method, self.prefix + target, body=body, headers=headers
+            )
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, HTTPException):
+            status = None
+            connection.close()
+            connection = self.connect()
+        return connection, status, time.perf_counter() - started
+
+    def run(self, requests, concurrency, duration):
+        '''Запускает concurrency потоков на duration секунд.
+
+        requests(number) для потока number возвращает бесконечный
+        итератор запросов (маршрут, метод, путь, заголовки, тело).
+        Итог — строки (маршрут, код, задержка) всех потоков
+        и длительность прогона.
+        '''
+        results = [[] for _ in range(concurrency)]
+        deadline = time.monotonic() + duration
+        started = time.monotonic()
+        threads = [
+            threading.Thread(
+                target=self.worker,
+                args=(requests(number), deadline, results[number]),
+            )
+            for number in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        results = [row for rows in results for row in rows]
+        if not results:
+            raise CommandError('Ни одного запроса не выполнено')
+        return results, elapsed
+
+    def worker(self, requests, deadline, results):
+        connection = self.connect()
+        for route, method, target, headers, body in requests:
+            if time.monotonic() >= deadline:
+                break
+            connection, status, latency = self.send(
+                connection, method, target, headers, body
+            )
+            results.append((route, status, latency))
+        connection.close()
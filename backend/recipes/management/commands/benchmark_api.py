@@ -0,0 +1,346 @@
+import json
+import math
+import statistics
+import time
+
+from api.pagination import CustomPagination
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from recipes.images import FORMATS, VARIANTS, get_executor, variant_name
+from recipes.management.benchmarking import percentile
+from recipes.models import Favorite, Ingredient, Recipe, ShopingCart, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.authentication import token_cache
+from users.models import Follow, User
+
+# Картинка 1x1 для создания рецепта.
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAQMAAAAl21bKAAAA'
+    'A1BMVEUAAACnej3aAAAAAXRSTlMAQObYZgAAAApJREFUCNdjYAAAAAIAAeIhvDMAAAAASU'
+    'VORK5CYII='
+)
+# Маршрут, метод, адрес, авторизация, предел запросов к базе. Число
+# запросов не должно зависеть от объёма данных — на любом масштабе
+# действует один и тот же предел.
+READS = (
+    ('recipes-list anon', 'get', '/api/recipes/', False, 4),
+    ('recipes-list', 'get', '/api/recipes/', True, 5),
+    ('recipes-list last page', 'get', '/api/recipes/?page={last_page}',
+     True, 5),
+    ('recipes-list cursor', 'get', '/api/recipes/?pagination=cursor',
+     True, 4),
+    ('recipes-list author', 'get', '/api/recipes/?author={author}', True, 5),
+    ('recipes-list tags', 'get', '/api/recipes/?tags={tag}&tags={tag2}',
+     True, 5),
+    ('recipes-list favorited', 'get', '/api/recipes/?is_favorited=1',
+     True, 5),
+    ('recipes-list in cart', 'get', '/api/recipes/?is_in_shopping_cart=1',
+     True, 5),
+    ('recipes-list popular', 'get', '/api/recipes/?ordering=-favorites_count',
+     True, 5),
+    ('recipes-list search', 'get', '/api/recipes/?search={word}', True, 5),
+    ('recipes-detail', 'get', '/api/recipes/{recipe}/', True, 5),
+    ('download_shopping_cart', 'get',
+     '/api/recipes/download_shopping_cart/', True, 2),
+    ('tags-list', 'get', '/api/tags/', False, 2),
+    ('tags-detail', 'get', '/api/tags/{tag_id}/', False, 2),
+    ('ingredients-list search', 'get', '/api/ingredients/?name={prefix}',
+     False, 1),
+    ('ingredients-detail', 'get', '/api/ingredients/{ingredient}/', False, 2),
+    ('user-list', 'get', '/api/users/', True, 2),
+    ('user-detail', 'get', '/api/users/{author}/', True, 1),
+    ('user-me', 'get', '/api/users/me/', True, 1),
+    ('user-subscriptions', 'get',
+     '/api/users/subscriptions/?recipes_limit=3', True, 3),
+)
+# Пары запрос/отмена, чтобы прогон не менял данные.
+WRITES = (
+    ('favorite add', 'post', '/api/recipes/{fresh_recipe}/favorite/', 7),
+    ('favorite remove', 'delete', '/api/recipes/{fresh_recipe}/favorite/', 7),
+    ('shopping_cart add', 'post',
+     '/api/recipes/{fresh_recipe}/shopping_cart/', 13),
+    ('shopping_cart remove', 'delete',
+     '/api/recipes/{fresh_recipe}/shopping_cart/', 13),
+    ('subscribe', 'post', '/api/users/{fresh_author}/subscribe/', 8),
+    ('unsubscribe', 'delete', '/api/users/{fresh_author}/subscribe/', 8),
+)
+RECIPE_WRITES = {
+    'recipes-create': 21,
+    'recipes-partial_update': 38,
+    'recipes-destroy': 30,
+}
+# Уровни объёма данных для бюджетов задержек, по числу рецептов.
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+BUDGETS = settings.BASE_DIR / 'budgets.json'
+
+
+def recipe_payloads():
+    '''Тела запросов на создание рецепта и на его изменение.'''
+    ingredients = list(
+        Ingredient.objects.order_by('id').values_list('id', flat=True)[:8]
+    )
+    tags = list(Tag.objects.order_by('id').values_list('id', flat=True))
+    payload = {
+        'ingredients': [{'id': pk, 'amount': 10} for pk in ingredients[:5]],
+        'tags': tags[:2],
+        'image': PNG,
+        'name': 'Замер',
+        'text': 'Рецепт для замера скорости API.',
+        'cooking_time': 10,
+    }
+    update = {
+        'ingredients': [{'id': pk, 'amount': 20} for pk in ingredients[3:]],
+        'tags': tags[1:3],
+        'cooking_time': 15,
+    }
+    return payload, update
+
+
+def scale_of(recipes):
+    '''Ближайший в логарифмической шкале уровень объёма.'''
+    return min(
+        SCALES,
+        key=lambda name: abs(math.log10(max(recipes, 1) / SCALES[name])),
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Замер задержки и числа запросов к базе для каждого маршрута API '
+        'на текущих данных (наполните их generate_dataset). Падает, если '
+        'число запросов превысило предел или p95 вышел за записанный '
+        'для этого объёма данных бюджет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--user',
+            help='Email пользователя для запросов с авторизацией, '
+                 'по умолчанию самый активный.',
+        )
+        parser.add_argument(
+            '--budgets',
+            default=BUDGETS,
+            help='JSON с бюджетами p95 по уровням объёма для сравнения, '
+                 'по умолчанию budgets.json рядом с manage.py.',
+        )
+        parser.add_argument(
+            '--record',
+            action='store_true',
+            help='Записать замеренные p95 в --budgets как бюджет '
+                 'для текущего уровня объёма.',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.5,
+            help='Допустимый рост p95 относительно бюджета, доля.',
+        )
+        parser.add_argument(
+            '--skip-writes',
+            action='store_true',
+            help='Только запросы на чтение.',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        recipes = Recipe.objects.count()
+        scale = scale_of(recipes)
+        print(f'Рецептов {recipes}, уровень {scale}, пользователь {user}')
+        self.repeat = options['repeat']
+        self.results = []
+        token = Token.objects.get_or_create(user=user)[0]
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        params = self.params(user)
+        # Без кеша токенов (AUTH_TOKEN_CACHE) чтение с токеном стоит
+        # на один запрос к базе больше.
+        token_query = int(token_cache() is None)
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for name, method, url, auth, budget in READS:
+                if name == 'download_shopping_cart' and not params['cart']:
+                    print(f'{name}: корзина пользователя пуста, пропущено')
+                    continue
+                self.measure(
+                    name, method, url.format(**params),
+                    budget + token_query * auth,
+                    client=self.client if auth else self.anonymous,
+                )
+            if not options['skip_writes']:
+                self.writes(params)
+        failures = self.report(options, scale)
+        if failures:
+            raise CommandError('\n'.join(failures))
+
+    def get_user(self, email):
+        if email:
+            return User.objects.get(email=email)
+        user = User.objects.annotate(
+            carts=Count('shopingcarts')
+        ).order_by('-carts', 'id').first()
+        if user is None:
+            raise CommandError('В базе нет пользователей')
+        return user
+
+    def params(self, user):
+        recipe = Recipe.objects.order_by('-id').first()
+        tags = list(Tag.objects.order_by('id')[:2])
+        ingredient = Ingredient.objects.order_by('id').first()
+        author = User.objects.order_by('-recipes_count', 'id').first()
+        if not recipe or not tags or not ingredient:
+            raise CommandError('Сначала наполните базу: generate_dataset')
+        fresh_recipe = Recipe.objects.exclude(
+            pk__in=Favorite.objects.filter(user=user).values('recipe')
+        ).exclude(
+            pk__in=ShopingCart.objects.filter(user=user).values('recipe')
+        ).order_by('-id').first()
+        fresh_author = User.objects.exclude(pk=user.pk).exclude(
+            pk__in=Follow.objects.filter(user=user).values('author')
+        ).order_by('-recipes_count', 'id').first()
+        return {
+            'recipe': recipe.id,
+            'word': recipe.name.split()[0],
+            'tag': tags[0].slug,
+            'tag2': tags[-1].slug,
+            'tag_id': tags[0].id,
+            'ingredient': ingredient.id,
+            'prefix': ingredient.name[:2],
+            'author': author.id,
+            'last_page': max(
+                1, -(-Recipe.objects.count() // CustomPagination.page_size)
+            ),
+            'cart': ShopingCart.objects.filter(user=user).exists(),
+            'fresh_recipe': fresh_recipe and fresh_recipe.id,
+            'fresh_author': fresh_author and fresh_author.id,
+        }
+
+    def request(self, client, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data, format='json')
+            if hasattr(response, 'streaming_content'):
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url}: {response.status_code} '
+                f'{response.content[:200]!r}'
+            )
+        return response, elapsed, len(context.captured_queries)
+
+    def measure(self, name, method, url, budget, client):
+        # Первый запрос прогревает кеши и в замер не входит.
+        self.request(client, method, url)
+        timings, queries = [], []
+        for _ in range(self.repeat):
+            _, elapsed, count = self.request(client, method, url)
+            timings.append(elapsed)
+            queries.append(count)
+        self.results.append((name, timings, max(queries), budget))
+
+    def writes(self, params):
+        if None in (params['fresh_recipe'], params['fresh_author']):
+            print('Нет рецепта или автора для записи, запись пропущена')
+            return
+        for name, method, url, budget in WRITES:
+            url = url.format(**params)
+            timings, queries = [], []
+            for _ in range(self.repeat):
+                if method == 'delete':
+                    self.request(self.client, 'post', url)
+                _, elapsed, count = self.request(self.client, method, url)
+                if method == 'post':
+                    self.request(self.client, 'delete', url)
+                timings.append(elapsed)
+                queries.append(count)
+            self.results.append((name, timings, max(queries), budget))
+        self.recipe_writes()
+
+    def recipe_writes(self):
+        payload, update = recipe_payloads()
+        samples = {name: ([], []) for name in RECIPE_WRITES}
+        images = []
+        for _ in range(self.repeat):
+            response, *sample = self.request(
+                self.client, 'post', '/api/recipes/', payload
+            )
+            recipe = Recipe.objects.get(pk=response.json()['id'])
+            url = f'/api/recipes/{recipe.id}/'
+            steps = [('recipes-create', sample)]
+            steps.append(('recipes-partial_update', self.request(
+                self.client, 'patch', url, update
+            )[1:]))
+            images.append(recipe.image.name)
+            steps.append(('recipes-destroy', self.request(
+                self.client, 'delete', url
+            )[1:]))
+            for name, (elapsed, count) in steps:
+                samples[name][0].append(elapsed)
+                samples[name][1].append(count)
+        for name, (timings, queries) in samples.items():
+            self.results.append(
+                (name, timings, max(queries), RECIPE_WRITES[name])
+            )
+        self.delete_images(images)
+
+    def delete_images(self, names):
+        '''Картинки удалённых рецептов и их уменьшенные копии, которые
+        фоновый пул успел сделать.'''
+        get_executor().shutdown(wait=True)
+        for name in names:
+            targets = [name] + [
+                variant_name(name, variant, extension)
+                for variant in VARIANTS for extension in FORMATS
+            ]
+            for target in targets:
+                default_storage.delete(target)
+
+    def report(self, options, scale):
+        budgets = {}
+        if not options['record']:
+            with open(options['budgets']) as file:
+                budgets = json.load(file).get(scale, {})
+        print(f'{"маршрут":34s} {"p50 мс":>8s} {"p95 мс":>8s} '
+              f'{"бюджет":>8s} {"запросы":>8s}')
+        failures, recorded = [], {}
+        for name, timings, queries, query_budget in self.results:
+            p50 = statistics.median(timings) * 1000
+            p95 = percentile(timings, 0.95) * 1000
+            recorded[name] = round(p95, 2)
+            budget = budgets.get(name)
+            print(
+                f'{name:34s} {p50:8.1f} {p95:8.1f} '
+                f'{budget if budget is not None else "-":>8} '
+                f'{queries:>4d}/{query_budget:<3d}'
+            )
+            if queries > query_budget:
+                failures.append(
+                    f'{name}: {queries} запросов к базе, предел {query_budget}'
+                )
+            limit = budget and budget * (1 + options['tolerance'])
+            if limit and p95 > limit:
+                failures.append(
+                    f'{name}: p95 {p95:.1f} мс, бюджет {budget} мс'
+                )
+        if options['record']:
+            self.record(options['budgets'], scale, recorded)
+        return failures
+
+    def record(self, path, scale, recorded):
+        try:
+            with open(path) as file:
+                budgets = json.load(file)
+        except FileNotFoundError:
+            budgets = {}
+        budgets[scale] = recorded
+        with open(path, 'w') as file:
+            json.dump(budgets, file, ensure_ascii=False, indent=2)
+            file.write('\n')
+        print(f'Бюджеты для уровня {scale} записаны в {path}')
@@ -0,0 +1,95 @@
+import time
+
+from api.serializers import RecipeReadSerializer, RecipeSerializer
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count
+from recipes.models import Recipe
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from users.models import User
+
+SERIALIZERS = (RecipeSerializer, RecipeReadSerializer)
+
+
+def cpu_per_run(function, repeat):
+    '''Процессорное время одного вызова, миллисекунды.'''
+    started = time.process_time()
+    for _ in range(repeat):
+        function()
+    return (time.process_time() - started) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Процессорное время на страницу списка рецептов: загрузка из базы '
+        'и сериализация с рендерингом JSON через RecipeSerializer и '
+        'RecipeReadSerializer. Ответы обоих сравниваются байт в байт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            nargs='+',
+            default=(6, 100),
+            help='Размеры страницы.',
+        )
+        parser.add_argument('--repeat', type=int, default=100)
+        parser.add_argument(
+            '--user',
+            help='Email пользователя; по умолчанию тот, у кого больше '
+                 'всего подписок.',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['user'])
+        print(f'{"пользователь":24s} {"рецептов":>8s} {"загрузка":>9s} '
+              f'{"до":>9s} {"после":>9s} {"ускорение":>9s}')
+        for viewer in (AnonymousUser(), user):
+            for limit in options['limit']:
+                self.measure(viewer, limit, options['repeat'])
+
+    def get_user(self, email):
+        users = User.objects.filter(is_active=True)
+        if email:
+            users = users.filter(email=email)
+        user = users.annotate(
+            follows=Count('follower')
+        ).order_by('-follows', 'id').first()
+        if user is None:
+            raise CommandError('Нет подходящего пользователя')
+        return user
+
+    def measure(self, user, limit, repeat):
+        request = APIRequestFactory().get('/api/recipes/', {'limit': limit})
+        request.user = user
+        queryset = Recipe.objects.with_related().with_user_flags(user)
+        recipes = list(queryset[:limit])
+        if not recipes:
+            raise CommandError('В базе нет рецептов: generate_dataset')
+        load = cpu_per_run(
+            lambda: list(queryset[:limit]), max(1, repeat // 10)
+        )
+        rendered, timings = [], []
+        for serializer in SERIALIZERS:
+
+            def run():
+                # Подписки на авторов кешируются на запросе.
+                request.__dict__.pop('_followed_author_ids', None)
+                return JSONRenderer().render(serializer(
+                    recipes, many=True, context={'request': request}
+                ).data)
+
+            rendered.append(run())
+            timings.append(cpu_per_run(run, repeat))
+        if rendered[0] != rendered[1]:
+            raise CommandError(
+                f'{SERIALIZERS[1].__name__} и {SERIALIZERS[0].__name__} '
+                f'дают разный JSON для {user} и {len(recipes)} рецептов'
+            )
+        before, after = timings
+        print(
+            f'{str(user)[:24]:24s} {len(recipes):8d} {load:7.2f}мс '
+            f'{before:7.2f}мс {after:7.2f}мс {before / after:8.1f}x'
+        )
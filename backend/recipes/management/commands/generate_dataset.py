@@ -0,0 +1,254 @@
+import random
+import time
+
+from itertools import accumulate
+
+from api.cache import invalidate
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import transaction
+from recipes.models import (
+    Favorite, Ingredient, IngredientInRecipe, Recipe, ShopingCart, Tag,
+)
+from recipes.search import index_recipes
+from users.models import Follow, User
+
+DISHES = (
+    'Борщ', 'Суп', 'Салат', 'Плов', 'Пирог', 'Омлет', 'Запеканка',
+    'Рагу', 'Каша', 'Блины', 'Котлеты', 'Паста', 'Ризотто', 'Жаркое',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'летний', 'пряный', 'сытный', 'лёгкий',
+    'праздничный', 'бабушкин', 'острый', 'нежный',
+)
+STEPS = (
+    'Нарезать овощи.', 'Обжарить на сильном огне.', 'Довести до кипения.',
+    'Тушить под крышкой.', 'Посолить и поперчить.', 'Запекать в духовке.',
+    'Подавать горячим.', 'Украсить зеленью.', 'Дать настояться.',
+)
+PASSWORD = 'dataset-password'
+
+
+def skewed(size, exponent):
+    '''Накопленные веса распределения Ципфа для random.choices:
+    элемент с номером k выпадает в 1 / k ** exponent раз чаще.'''
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, рецептами, '
+        'избранным, корзинами и подписками с перекосом популярности, '
+        'как на живом сайте. Повторный запуск с тем же --prefix '
+        'добавляет данные к уже созданным.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument(
+            '--authors-share',
+            type=float,
+            default=0.2,
+            help='Доля пользователей, публикующих рецепты.',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            nargs=2,
+            default=(3, 15),
+            metavar=('MIN', 'MAX'),
+            help='Ингредиентов в рецепте.',
+        )
+        parser.add_argument(
+            '--favorites', type=float, default=10,
+            help='Среднее число избранных рецептов у пользователя.',
+        )
+        parser.add_argument(
+            '--carts', type=float, default=3,
+            help='Среднее число рецептов в корзине у пользователя.',
+        )
+        parser.add_argument(
+            '--follows', type=float, default=5,
+            help='Среднее число подписок у пользователя.',
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности.',
+        )
+        parser.add_argument('--prefix', default='dataset')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Сначала удалить пользователей с этим --prefix '
+                 'вместе с их рецептами.',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.options = options
+        self.ingredient_ids = list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+        if not self.ingredient_ids or not self.tag_ids:
+            raise CommandError(
+                'Сначала загрузите теги и ингредиенты: '
+                'load_tags и load_ingredients'
+            )
+        low, high = options['ingredients']
+        if not 1 <= low <= high:
+            raise CommandError('Ожидается 1 <= MIN <= MAX для --ingredients')
+        users = User.objects.filter(
+            email__startswith=options['prefix'] + '-'
+        )
+        if options['clear']:
+            deleted, _ = users.delete()
+            print(f'Удалено записей: {deleted}')
+        started = time.monotonic()
+        user_ids = self.create_users(users.count(), options['users'])
+        authors = user_ids[:max(1, int(len(user_ids)
+                                       * options['authors_share']))]
+        recipe_ids = self.create_recipes(authors, options['recipes'])
+        self.random.shuffle(recipe_ids)
+        self.create_links(
+            Favorite, 'recipe_id', user_ids, recipe_ids, options['favorites']
+        )
+        self.create_links(
+            ShopingCart, 'recipe_id', user_ids, recipe_ids, options['carts']
+        )
+        self.create_links(
+            Follow, 'author_id', user_ids, authors, options['follows']
+        )
+        self.finish(recipe_ids)
+        print(f'Готово за {time.monotonic() - started:.1f} с')
+
+    def create_users(self, offset, count):
+        password = make_password(PASSWORD)
+        prefix = self.options['prefix']
+        users = [
+            User(
+                email=f'{prefix}-{number}@example.com',
+                username=f'{prefix}-{number}',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            )
+            for number in range(offset, offset + count)
+        ]
+        for batch in batched(users, self.batch_size):
+            # Postgres и SQLite 3.35+ возвращают id созданных строк.
+            User.objects.bulk_create(batch)
+        print(f'Пользователей: {count}, пароль {PASSWORD!r}')
+        return [user.pk for user in users]
+
+    def recipe(self, author_id):
+        return Recipe(
+            author_id=author_id,
+            name=(
+                f'{self.random.choice(DISHES)} '
+                f'{self.random.choice(ADJECTIVES)}'
+            ),
+            text=' '.join(self.random.sample(STEPS, 3)),
+            cooking_time=min(
+                600, max(1, int(self.random.lognormvariate(3.4, 0.6)))
+            ),
+        )
+
+    def create_recipes(self, authors, count):
+        author_weights = skewed(len(authors), self.options['skew'])
+        ingredient_weights = skewed(len(self.ingredient_ids), 0.8)
+        low, high = self.options['ingredients']
+        recipe_ids = []
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            recipes = [
+                self.recipe(author_id) for author_id in self.random.choices(
+                    authors, cum_weights=author_weights, k=size
+                )
+            ]
+            with transaction.atomic():
+                recipes = Recipe.objects.bulk_create(recipes)
+                tags, ingredients = [], []
+                for recipe in recipes:
+                    tags.extend(
+                        Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag)
+                        for tag in self.random.sample(
+                            self.tag_ids,
+                            self.random.randint(1, min(3, len(self.tag_ids))),
+                        )
+                    )
+                    size = min(
+                        self.random.randint(low, high),
+                        len(self.ingredient_ids),
+                    )
+                    chosen = set()
+                    while len(chosen) < size:
+                        chosen.update(self.random.choices(
+                            self.ingredient_ids,
+                            cum_weights=ingredient_weights,
+                            k=size - len(chosen),
+                        ))
+                    ingredients.extend(
+                        IngredientInRecipe(
+                            recipe_id=recipe.pk,
+                            ingredient_id=ingredient,
+                            amount=self.random.choice(
+                                (1, 2, 5, 10, 50, 100, 200, 500)
+                            ),
+                        )
+                        for ingredient in chosen
+                    )
+                Recipe.tags.through.objects.bulk_create(tags)
+                IngredientInRecipe.objects.bulk_create(
+                    ingredients, batch_size=self.batch_size
+                )
+            recipe_ids.extend(recipe.pk for recipe in recipes)
+            print(f'Рецептов: {len(recipe_ids)}/{count}')
+        return recipe_ids
+
+    def create_links(self, model, field, user_ids, targets, mean):
+        '''Связи пользователей с популярными объектами: число связей
+        у пользователя распределено экспоненциально со средним mean,
+        цель выбирается по Ципфу.'''
+        if not targets or mean <= 0:
+            return
+        weights = skewed(len(targets), self.options['skew'])
+        links, total = [], 0
+        for user_id in user_ids:
+            size = min(len(targets), int(self.random.expovariate(1 / mean)))
+            chosen = set(self.random.choices(
+                targets, cum_weights=weights, k=size
+            ))
+            if field == 'author_id':
+                chosen.discard(user_id)
+            links.extend(
+                model(user_id=user_id, **{field: target})
+                for target in chosen
+            )
+            if len(links) >= self.batch_size:
+                total += len(links)
+                model.objects.bulk_create(links, ignore_conflicts=True)
+                links = []
+        if links:
+            total += len(links)
+            model.objects.bulk_create(links, ignore_conflicts=True)
+        print(f'{model._meta.verbose_name_plural}: {total}')
+
+    def finish(self, recipe_ids):
+        '''bulk_create не шлёт сигналы: пересчитывает то, что обычно
+        поддерживают они.'''
+        for batch in batched(sorted(recipe_ids), 1000):
+            with transaction.atomic():
+                index_recipes(batch)
+        call_command('repair_counters')
+        call_command('rebuild_shopping_lists')
+        invalidate(catalog=True)
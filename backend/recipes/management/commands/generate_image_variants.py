@@ -0,0 +1,32 @@
+from django.core.management import BaseCommand
+from django.utils import timezone
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Обработать и рецепты, у которых копии уже есть.',
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        processed = 0
+        for pk, name in recipes.values_list('pk', 'image').iterator():
+            try:
+                variants = generate_variants(name)
+            except (OSError, ValueError) as error:
+                print(f'{name}: {type(error).__name__} has occurred.')
+                continue
+            Recipe.objects.filter(pk=pk).update(
+                image_variants=variants, updated_at=timezone.now()
+            )
+            processed += 1
+        print(f'Обработано картинок: {processed}')
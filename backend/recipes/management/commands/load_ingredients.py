@@ -1,32 +1,197 @@
+import csv
+import io
 import json
+import time
 
-from django.core.management import BaseCommand
-from recipes.models import Ingredient
+from itertools import islice
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.models import CatalogVersion, Ingredient, IngredientInRecipe
+
+DEFAULT_PATH = './data/ingredients.json'
+READ_SIZE = 64 * 1024
+
+
+def iter_json(file):
+    '''Потоковое чтение JSON-массива объектов или JSON Lines.'''
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in '[], \t\r\n':
+            position += 1
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = file.read(READ_SIZE), 0
+            eof = not buffer
+            continue
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(READ_SIZE)
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item['name'], item['measurement_unit']
+        position = end
+
+
+def iter_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+class CsvStream(io.RawIOBase):
+    '''Файлоподобный объект с CSV-строками для COPY FROM STDIN.'''
+
+    def __init__(self, rows, counter):
+        self.rows = rows
+        self.counter = counter
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def _encode(self, row):
+        line = io.StringIO()
+        csv.writer(line).writerow(row)
+        self.counter(1)
+        return line.getvalue().encode('utf-8')
+
+    def readinto(self, target):
+        while len(self.buffer) < len(target):
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.buffer += self._encode(row)
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
 
 
 class Command(BaseCommand):
-    help = 'Загрузка из csv файла'
+    help = 'Загрузка ингредиентов из json или csv файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument(
+            '--format',
+            choices=('json', 'csv'),
+            help='Формат файла, по умолчанию определяется по расширению.',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Удалить ингредиенты, которых нет в файле '
+                 'и которые не используются в рецептах.',
+        )
 
-    def handle(self, *args, **kwargs):
-        if Ingredient.objects.exists():
-            print('В базе уже есть ингредиент.')
-            return
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if file_format not in ('json', 'csv'):
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        self.read = 0
+        self.started = time.monotonic()
+        before = Ingredient.objects.count()
         try:
-            with open(
-                './data/ingredients.json',
-                'r',
-                encoding='utf-8'
-            ) as file:
-                jsondata = json.load(file)
-                for line in jsondata:
-                    if not Ingredient.objects.filter(
-                       name=line['name'],
-                       measurement_unit=line['measurement_unit']).exists():
-                        Ingredient.objects.create(
-                            name=line['name'],
-                            measurement_unit=line['measurement_unit']
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                rows = iter_json(file) if file_format == 'json' else (
+                    iter_csv(file)
+                )
+                with transaction.atomic():
+                    if connection.vendor == 'postgresql':
+                        self.copy(rows, options['prune'])
+                    else:
+                        self.bulk_upsert(
+                            rows, options['batch_size'], options['prune']
                         )
-        except ValueError as error:
-            print(f"A {type(error).__name__} has occurred.")
-        else:
-            print('Загрузка ингредиентов завершена')
+        except (OSError, ValueError, KeyError, IndexError) as error:
+            raise CommandError(
+                f'A {type(error).__name__} has occurred: {error}'
+            )
+        CatalogVersion.objects.bump(CatalogVersion.INGREDIENTS)
+        after = Ingredient.objects.count()
+        print(
+            f'Загрузка ингредиентов завершена: прочитано {self.read}, '
+            f'в базе было {before}, стало {after} '
+            f'за {time.monotonic() - self.started:.1f} с'
+        )
+
+    def progress(self, count):
+        self.read += count
+        if self.read % 100000 < count:
+            print(f'Прочитано строк: {self.read}')
+
+    def bulk_upsert(self, rows, batch_size, prune):
+        seen = set()
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            self.progress(len(batch))
+            if prune:
+                seen.update(batch)
+            Ingredient.objects.bulk_create(
+                (
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in batch
+                ),
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+        if prune:
+            stale = [
+                pk for pk, name, measurement_unit in (
+                    self.unused_ingredients().values_list(
+                        'pk', 'name', 'measurement_unit'
+                    ).iterator()
+                )
+                if (name, measurement_unit) not in seen
+            ]
+            for start in range(0, len(stale), batch_size):
+                Ingredient.objects.filter(
+                    pk__in=stale[start:start + batch_size]
+                ).delete()
+
+    def copy(self, rows, prune):
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import FROM STDIN WITH (FORMAT csv)',
+                CsvStream(rows, self.progress),
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import '
+                'ON CONFLICT (name, measurement_unit) DO NOTHING'
+            )
+            if prune:
+                unused = self.unused_ingredients().values('pk')
+                sql, params = unused.query.sql_with_params()
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE id IN ({sql}) '
+                    'AND NOT EXISTS (SELECT 1 FROM ingredient_import i '
+                    f'WHERE i.name = {table}.name '
+                    f'AND i.measurement_unit = {table}.measurement_unit)',
+                    params,
+                )
+
+    def unused_ingredients(self):
+        return Ingredient.objects.exclude(
+            pk__in=IngredientInRecipe.objects.values('ingredient_id')
+        )
@@ -1,5 +1,5 @@
 from django.core.management import BaseCommand
-from recipes.models import Tag
+from recipes.models import CatalogVersion, Tag
 
 
 class Command(BaseCommand):
@@ -16,6 +16,7 @@ class Command(BaseCommand):
         ]
         try:
             Tag.objects.bulk_create(Tag(**tag) for tag in data)
+            CatalogVersion.objects.bump(CatalogVersion.TAGS)
         except ValueError as error:
             print(f"A {type(error).__name__} has occurred.")
         else:
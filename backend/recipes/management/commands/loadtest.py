@@ -0,0 +1,82 @@
+from collections import defaultdict
+from itertools import count
+from urllib.parse import quote
+
+from django.core.management import BaseCommand
+from recipes.management.benchmarking import HTTPLoad, percentile
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=мо',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенного сервера: GET-запросы по кругу '
+        'с заданной конкурентностью, итог — RPS и перцентили задержек. '
+        'Для сравнения режимов прогоните его против SERVER_MODE=wsgi '
+        'и SERVER_MODE=asgi с одинаковыми параметрами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('base_url', help='Например, http://127.0.0.1:8000')
+        parser.add_argument(
+            '--path',
+            action='append',
+            dest='paths',
+            help='Путь с query-строкой; можно указать несколько раз.',
+        )
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument(
+            '--duration', type=float, default=30, help='Секунды.'
+        )
+        parser.add_argument('--token', help='Токен для Authorization.')
+
+    def handle(self, *args, **options):
+        load = HTTPLoad(options['base_url'])
+        paths = [
+            quote(path, safe="/?&=%:+,")
+            for path in options['paths'] or DEFAULT_PATHS
+        ]
+        headers = {'Accept': 'application/json'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+
+        def requests(number):
+            # Потоки начинают с разных путей и идут по ним по кругу.
+            for position in count(number):
+                path = paths[position % len(paths)]
+                yield path, 'GET', path, headers, None
+
+        results, elapsed = load.run(
+            requests, options['concurrency'], options['duration']
+        )
+        self.report(results, elapsed, options['concurrency'])
+
+    def report(self, results, elapsed, concurrency):
+        by_path = defaultdict(list)
+        for path, status, latency in results:
+            by_path[path].append((status, latency))
+        print(
+            f'Конкурентность {concurrency}, {elapsed:.1f} с, '
+            f'запросов {len(results)}, RPS {len(results) / elapsed:.1f}'
+        )
+        print(f'{"путь":40s} {"n":>7s} {"ошибки":>7s} '
+              f'{"p50":>8s} {"p90":>8s} {"p99":>8s} {"max":>8s}')
+        for path, rows in list(by_path.items()) + [('всего', [
+            (status, latency) for _, status, latency in results
+        ])]:
+            latencies = sorted(latency * 1000 for _, latency in rows)
+            errors = sum(
+                1 for status, _ in rows if status is None or status >= 400
+            )
+            print(
+                f'{path[:40]:40s} {len(rows):7d} {errors:7d} '
+                + ' '.join(
+                    f'{percentile(latencies, share):8.1f}'
+                    for share in (0.5, 0.9, 0.99, 1)
+                )
+            )
@@ -0,0 +1,28 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from recipes.models import Recipe
+from recipes.search import index_recipes
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт поискового индекса рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id, total = 0, 0
+        while True:
+            ids = list(
+                Recipe.objects.filter(pk__gt=last_id)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            with transaction.atomic():
+                index_recipes(ids)
+            last_id = ids[-1]
+            total += len(ids)
+        print(f'Поисковый индекс пересчитан: {total} рецептов')
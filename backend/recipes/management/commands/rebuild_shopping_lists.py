@@ -0,0 +1,54 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import ShopingCartIngredient
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт агрегированных списков покупок по корзинам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить итоги, ничего не изменяя.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expected = ShopingCartIngredient.objects.aggregate_from_carts()
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in (
+                ShopingCartIngredient.objects.values_list(
+                    'user_id', 'ingredient_id', 'amount'
+                ).iterator()
+            )
+        }
+        mismatched = {
+            key for key in expected.keys() | stored.keys()
+            if expected.get(key) != stored.get(key)
+        }
+        if options['check']:
+            if mismatched:
+                raise CommandError(
+                    f'Расхождений в списках покупок: {len(mismatched)}'
+                )
+            print('Списки покупок согласованы')
+            return
+        with transaction.atomic():
+            ShopingCartIngredient.objects.all().delete()
+            ShopingCartIngredient.objects.bulk_create(
+                (
+                    ShopingCartIngredient(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for (user_id, ingredient_id), amount in expected.items()
+                ),
+                batch_size=options['batch_size'],
+            )
+        print(
+            f'Списки покупок пересчитаны: {len(expected)} строк, '
+            f'исправлено расхождений: {len(mismatched)}'
+        )
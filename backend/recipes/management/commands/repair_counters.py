@@ -0,0 +1,60 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe, ShopingCart
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', ShopingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def actual_count(link_model, link_field):
+    '''Число связанных записей, посчитанное по таблице связей.'''
+    return Coalesce(
+        Subquery(
+            link_model.objects.filter(**{link_field: OuterRef('pk')})
+            .order_by()
+            .values(link_field)
+            .annotate(total=Count('pk'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Сверка и исправление счётчиков рецептов и пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Только сверить счётчики, ничего не изменяя.',
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, field, link_model, link_field in COUNTERS:
+            actual = actual_count(link_model, link_field)
+            drifted = model.objects.annotate(actual=actual).exclude(
+                **{field: F('actual')}
+            )
+            with transaction.atomic():
+                count = drifted.count()
+                if count and not options['check']:
+                    model.objects.filter(
+                        pk__in=drifted.values('pk')
+                    ).update(**{field: actual})
+            total += count
+            print(f'{model.__name__}.{field}: расхождений {count}')
+        if options['check']:
+            if total:
+                raise CommandError(f'Расхождений в счётчиках: {total}')
+            print('Счётчики согласованы')
+        else:
+            print(f'Счётчики пересчитаны, исправлено расхождений: {total}')
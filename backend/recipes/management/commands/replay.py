@@ -0,0 +1,463 @@
+import json
+import random
+import re
+
+from collections import Counter, defaultdict
+from itertools import accumulate
+from urllib.parse import parse_qsl, quote, urlsplit
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from recipes.management.benchmarking import HTTPLoad, percentile
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+COLLECTION = (
+    settings.BASE_DIR.parent / 'postman' / 'diploma.postman_collection.json'
+)
+VARIABLE = re.compile(r'{{(\w+)}}')
+OBJECT_ID = re.compile(r'/\d+(?=/|$)')
+SAFE = "/?&=%:+,"
+# Окончание имени переменной коллекции -> набор значений из базы.
+POOLS = (
+    ('userid', 'users'),
+    ('recipeid', 'recipes'),
+    ('tagid', 'tags'),
+    ('tagslug', 'slugs'),
+    ('indredientid', 'ingredients'),
+    ('ingredientid', 'ingredients'),
+    ('firstlatter', 'letters'),
+    ('firstletter', 'letters'),
+)
+SHARES = (0.5, 0.95, 0.99)
+TOTAL = 'всего'
+
+
+def pool_of(name):
+    for suffix, pool in POOLS:
+        if name.lower().endswith(suffix):
+            return pool
+    return None
+
+
+def _auth(node, inherited):
+    auth = node.get('auth')
+    return auth['type'] == 'apikey' if auth else inherited
+
+
+def collection_scenarios(path, bad_requests=False):
+    '''Сценарии из GET-запросов postman-коллекции: папка с запросами —
+    сценарий, запросы в нём идут подряд. Запись в коллекции — разовые
+    шаги (регистрация, удаление рецептов), повторять их по кругу нельзя.
+    '''
+    with open(path, encoding='utf-8') as file:
+        collection = json.load(file)
+    scenarios = []
+
+    def walk(items, names, auth):
+        steps = []
+        for item in items:
+            name = item['name'].split(' //')[0].strip()
+            if 'item' in item:
+                if bad_requests or 'bad_request' not in name:
+                    walk(item['item'], names + [name], _auth(item, auth))
+                continue
+            request = item['request']
+            if request['method'] != 'GET':
+                continue
+            url = request['url']
+            target = (url['raw'] if isinstance(url, dict) else url).replace(
+                '{{baseUrl}}', ''
+            )
+            token = _auth(request, auth)
+            route = f'GET {target}' + (' +token' if token else '')
+            steps.append((route, 'GET', target, None, token))
+        if steps:
+            scenarios.append(['/'.join(names), 1, steps])
+
+    walk(collection['item'], [], _auth(collection, False))
+    variables = {
+        variable['key']: variable['value']
+        for variable in collection.get('variable', ())
+    }
+    return scenarios, variables
+
+
+def log_route(method, target):
+    '''Маршрут записи журнала: id в пути заменяются на {id}, от
+    query-строки остаются имена параметров.'''
+    url = urlsplit(target)
+    route = f'{method} {OBJECT_ID.sub("/{id}", url.path)}'
+    names = sorted({name for name, _ in parse_qsl(url.query, True)})
+    return route + ('?' + '&'.join(names) if names else '')
+
+
+def log_scenarios(path):
+    '''Сценарии из журнала JSONL: строка — объект с полями path и
+    необязательными method, body, auth и scenario. Строки с одним
+    scenario идут подряд как один сценарий, остальные — сценарии из
+    одного запроса с весом по числу повторов.'''
+    sessions = defaultdict(list)
+    singles = Counter()
+    with open(path, encoding='utf-8') as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                method = entry.get('method', 'GET').upper()
+                target = entry['path']
+            except (ValueError, KeyError, AttributeError):
+                raise CommandError(
+                    f'{path}:{number}: ожидается JSON-объект с полем path'
+                )
+            body = entry.get('body')
+            if body is not None and not isinstance(body, str):
+                body = json.dumps(body, ensure_ascii=False)
+            step = (
+                log_route(method, target),
+                method,
+                target,
+                body,
+                entry.get('auth', True),
+            )
+            if 'scenario' in entry:
+                sessions[str(entry['scenario'])].append(step)
+            else:
+                singles[step] += 1
+    return [
+        [name, 1, steps] for name, steps in sessions.items()
+    ] + [
+        [f'{step[1]} {step[2]}', count, [step]]
+        for step, count in singles.items()
+    ]
+
+
+def value_pools(sample):
+    ingredients = list(
+        Ingredient.objects.order_by('id').values_list('id', 'name')[:sample]
+    )
+    tags = list(Tag.objects.order_by('id').values_list('id', 'slug'))
+    return {
+        'users': list(
+            User.objects.filter(is_active=True)
+            .order_by('-id').values_list('id', flat=True)[:sample]
+        ),
+        'recipes': list(
+            Recipe.objects.order_by('-id')
+            .values_list('id', flat=True)[:sample]
+        ),
+        'tags': [pk for pk, _ in tags],
+        'slugs': [slug for _, slug in tags],
+        'ingredients': [pk for pk, _ in ingredients],
+        'letters': sorted({name[:1].lower() for _, name in ingredients}),
+    }
+
+
+def summarize(results, elapsed):
+    by_route = defaultdict(list)
+    for route, status, latency in results:
+        by_route[route].append((status, latency))
+    by_route[TOTAL] = [(status, latency) for _, status, latency in results]
+    routes = {}
+    for route, rows in by_route.items():
+        latencies = sorted(latency * 1000 for _, latency in rows)
+        statuses = Counter(str(status) for status, _ in rows)
+        errors = sum(
+            1 for status, _ in rows if status is None or status >= 400
+        )
+        routes[route] = {
+            'count': len(rows),
+            'rps': len(rows) / elapsed,
+            'errors': errors / len(rows),
+            'statuses': dict(statuses),
+            **{
+                f'p{round(share * 100)}': percentile(latencies, share)
+                for share in SHARES
+            },
+        }
+    return routes
+
+
+def _change(before, after):
+    if not before:
+        return '—'
+    return f'{(after - before) / before * 100:+.1f}%'
+
+
+class Command(BaseCommand):
+    help = (
+        'Воспроизводит трафик против запущенного сервера: сценарии из '
+        'postman-коллекции или журнала запросов JSONL выбираются по весам '
+        'с заданной конкурентностью. Итог — RPS, p50/p95/p99 и доля ошибок '
+        'по маршрутам; --output сохраняет прогон, --compare сравнивает два '
+        'сохранённых прогона.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'base_url', nargs='?', help='Например, http://127.0.0.1:8000'
+        )
+        parser.add_argument(
+            '--collection',
+            default=str(COLLECTION),
+            help='Postman-коллекция, по умолчанию из каталога postman.',
+        )
+        parser.add_argument('--log', help='Журнал запросов JSONL.')
+        parser.add_argument(
+            '--bad-requests',
+            action='store_true',
+            help='Добавить GET-запросы из папок *bad_requests коллекции.',
+        )
+        parser.add_argument(
+            '--weight',
+            action='append',
+            default=[],
+            metavar='SCENARIO=N',
+            help='Вес сценария (по умолчанию 1); 0 исключает сценарий.',
+        )
+        parser.add_argument(
+            '--var',
+            action='append',
+            default=[],
+            metavar='NAME=VALUE',
+            help='Значение переменной {{NAME}} вместо взятого из базы.',
+        )
+        parser.add_argument(
+            '--sample', type=int, default=1000,
+            help='Сколько объектов каждого вида брать из базы.',
+        )
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument(
+            '--duration', type=float, default=30, help='Секунды.'
+        )
+        parser.add_argument('--token', help='Токен для Authorization.')
+        parser.add_argument(
+            '--user', help='Email пользователя, чей токен использовать.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Сохранить прогон в JSON.')
+        parser.add_argument(
+            '--compare',
+            nargs=2,
+            metavar=('BEFORE', 'AFTER'),
+            help='Сравнить два прогона, сохранённых через --output.',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            help='С --compare: ошибка, если p95 какого-то маршрута вырос '
+                 'больше чем на столько процентов.',
+        )
+
+    def handle(self, *args, **options):
+        if options['compare']:
+            return self.compare(*options['compare'], options['tolerance'])
+        self.load = HTTPLoad(options['base_url'])
+        self.token = self.get_token(options['token'], options['user'])
+        source = options['log'] or options['collection']
+        if options['log']:
+            scenarios, variables = log_scenarios(source), {}
+        else:
+            scenarios, variables = collection_scenarios(
+                source, options['bad_requests']
+            )
+        scenarios = self.prepare(scenarios, options['weight'])
+        self.resolve_variables(
+            scenarios, variables, options['var'], options['sample']
+        )
+        self.run(scenarios, options)
+        summary = {
+            'base_url': options['base_url'],
+            'source': source,
+            'concurrency': options['concurrency'],
+            'elapsed': self.elapsed,
+            'routes': summarize(self.results, self.elapsed),
+        }
+        self.report(summary)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(summary, file, ensure_ascii=False, indent=2)
+            print(f'Прогон сохранён в {options["output"]}')
+
+    def get_token(self, token, email):
+        if token or not email:
+            return token
+        try:
+            user = User.objects.get(email=email)
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {email}')
+        return Token.objects.get_or_create(user=user)[0].key
+
+    def prepare(self, scenarios, weights):
+        '''Применяет --weight и убирает запросы с авторизацией, если
+        токена нет.'''
+        by_name = {}
+        for scenario in scenarios:
+            by_name[scenario[0]] = scenario
+            by_name.setdefault(scenario[0].rsplit('/', 1)[-1], scenario)
+        for item in weights:
+            name, _, weight = item.rpartition('=')
+            if name not in by_name or not weight.isdigit():
+                raise CommandError(
+                    f'--weight {item}: ожидается СЦЕНАРИЙ=ЧИСЛО, сценарии: '
+                    + ', '.join(scenario[0] for scenario in scenarios)
+                )
+            by_name[name][1] = int(weight)
+        if not self.token:
+            skipped = sum(
+                1 for _, _, steps in scenarios for step in steps if step[4]
+            )
+            if skipped:
+                print(f'Без --token пропущено запросов с авторизацией: '
+                      f'{skipped}')
+            for scenario in scenarios:
+                scenario[2] = [step for step in scenario[2] if not step[4]]
+        scenarios = [
+            scenario for scenario in scenarios
+            if scenario[1] > 0 and scenario[2]
+        ]
+        if not scenarios:
+            raise CommandError('Не осталось ни одного сценария')
+        return scenarios
+
+    def resolve_variables(self, scenarios, variables, overrides, sample):
+        '''Постоянные значения переменных берутся из --var и коллекции,
+        id и slug — случайно из базы при каждом проходе сценария.'''
+        self.fixed = dict(variables)
+        for item in overrides:
+            name, separator, value = item.partition('=')
+            if not separator:
+                raise CommandError(f'--var {item}: ожидается ИМЯ=ЗНАЧЕНИЕ')
+            self.fixed[name] = value
+        pools = value_pools(sample)
+        self.pools = {}
+        for _, _, steps in scenarios:
+            for _, _, target, body, _ in steps:
+                for name in VARIABLE.findall(target + (body or '')):
+                    if name in self.fixed:
+                        continue
+                    pool = pool_of(name)
+                    if pool is None:
+                        raise CommandError(
+                            f'Неизвестная переменная {{{{{name}}}}}, '
+                            f'задайте её через --var {name}=...'
+                        )
+                    if not pools[pool]:
+                        raise CommandError(
+                            f'Для {{{{{name}}}}} в базе нет объектов'
+                        )
+                    self.pools[name] = pools[pool]
+
+    def run(self, scenarios, options):
+        weights = list(accumulate(weight for _, weight, _ in scenarios))
+        print(
+            f'Сценариев {len(scenarios)}: '
+            + ', '.join(f'{name}×{weight}' for name, weight, _ in scenarios)
+        )
+        steps = [steps for _, _, steps in scenarios]
+        self.results, self.elapsed = self.load.run(
+            lambda number: self.requests(
+                steps, weights, random.Random(options['seed'] + number)
+            ),
+            options['concurrency'],
+            options['duration'],
+        )
+
+    def requests(self, scenarios, weights, rng):
+        while True:
+            values = {}
+
+            def substitute(match):
+                name = match[1]
+                if name in self.fixed:
+                    return self.fixed[name]
+                if name not in values:
+                    values[name] = str(rng.choice(self.pools[name]))
+                return values[name]
+
+            steps = rng.choices(scenarios, cum_weights=weights)[0]
+            for route, method, target, body, auth in steps:
+                if body is not None:
+                    body = VARIABLE.sub(substitute, body).encode()
+                yield (
+                    route,
+                    method,
+                    quote(VARIABLE.sub(substitute, target), safe=SAFE),
+                    self.headers(body, auth),
+                    body,
+                )
+
+    def headers(self, body, auth):
+        headers = {'Accept': '*/*'}
+        if auth and self.token:
+            headers['Authorization'] = f'Token {self.token}'
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        return headers
+
+    def report(self, summary):
+        total = summary['routes'][TOTAL]
+        print(
+            f'Конкурентность {summary["concurrency"]}, '
+            f'{summary["elapsed"]:.1f} с, запросов {total["count"]}, '
+            f'RPS {total["rps"]:.1f}'
+        )
+        print(f'{"маршрут":56s} {"n":>7s} {"rps":>7s} {"ошибки":>7s} '
+              f'{"p50":>8s} {"p95":>8s} {"p99":>8s}')
+        for route, stats in sorted(
+            summary['routes'].items(), key=lambda item: item[0] == TOTAL
+        ):
+            print(
+                f'{route[:56]:56s} {stats["count"]:7d} {stats["rps"]:7.1f} '
+                f'{stats["errors"]:7.1%} {stats["p50"]:8.1f} '
+                f'{stats["p95"]:8.1f} {stats["p99"]:8.1f}'
+            )
+            failed = {
+                status: count for status, count in stats['statuses'].items()
+                if status == 'None' or int(status) >= 400
+            }
+            if failed and route != TOTAL:
+                print(f'{"":56s} коды ошибок: {failed}')
+
+    def compare(self, before_path, after_path, tolerance):
+        runs = []
+        for path in (before_path, after_path):
+            try:
+                with open(path, encoding='utf-8') as file:
+                    runs.append(json.load(file)['routes'])
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f'{path}: {error}')
+        before, after = runs
+        print(f'{before_path} -> {after_path}')
+        print(f'{"маршрут":56s} {"rps":>8s} {"p50":>8s} {"p95":>8s} '
+              f'{"p99":>8s} {"ошибки":>15s}')
+        regressions = []
+        for route in sorted(
+            set(before) | set(after), key=lambda route: (route == TOTAL, route)
+        ):
+            if route not in before or route not in after:
+                print(f'{route[:56]:56s} есть только в '
+                      f'{before_path if route in before else after_path}')
+                continue
+            old, new = before[route], after[route]
+            print(
+                f'{route[:56]:56s} '
+                + ' '.join(
+                    f'{_change(old[key], new[key]):>8s}'
+                    for key in ('rps', 'p50', 'p95', 'p99')
+                )
+                + f' {old["errors"]:6.1%} -> {new["errors"]:6.1%}'
+            )
+            if (
+                tolerance is not None
+                and old['p95']
+                and (new['p95'] - old['p95']) / old['p95'] * 100 > tolerance
+            ):
+                regressions.append(route)
+        if regressions:
+            raise CommandError(
+                f'p95 вырос больше чем на {tolerance}%: '
+                + ', '.join(regressions)
+            )
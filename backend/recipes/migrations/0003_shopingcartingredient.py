@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopingcart_ingredients(apps, schema_editor):
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShopingCartIngredient = apps.get_model('recipes', 'ShopingCartIngredient')
+    totals = IngredientInRecipe.objects.filter(
+        recipe__shopingcarts__isnull=False
+    ).values('recipe__shopingcarts__user', 'ingredient').annotate(
+        total=models.Sum('amount')
+    ).order_by()
+    ShopingCartIngredient.objects.bulk_create(
+        (
+            ShopingCartIngredient(
+                user_id=row['recipe__shopingcarts__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['total'],
+            )
+            for row in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_auto_20230927_1526'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopingCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopingcart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент в списке покупок',
+                'verbose_name_plural': 'Ингредиенты в списке покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shopingcartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopingcart_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shopingcart_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:41
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def merge_rows(model, owner, ids, keep):
+    '''Строки model с ингредиентами ids сливаются в одну строку
+    с ingredient_id=keep на каждого владельца (рецепт или пользователя),
+    количества складываются.'''
+    by_owner = defaultdict(list)
+    for row in model.objects.filter(ingredient_id__in=ids).order_by('id'):
+        by_owner[getattr(row, owner)].append(row)
+    for rows in by_owner.values():
+        kept = next(
+            (row for row in rows if row.ingredient_id == keep), rows[0]
+        )
+        total = sum(row.amount for row in rows)
+        if len(rows) == 1 and kept.ingredient_id == keep:
+            continue
+        model.objects.filter(
+            pk__in=[row.pk for row in rows if row is not kept]
+        ).delete()
+        kept.ingredient_id = keep
+        kept.amount = total
+        kept.save(update_fields=['ingredient', 'amount'])
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShopingCartIngredient = apps.get_model('recipes', 'ShopingCartIngredient')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for group in duplicates:
+        keep = group['keep']
+        ids = list(Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).values_list('id', flat=True))
+        merge_rows(IngredientInRecipe, 'recipe_id', ids, keep)
+        merge_rows(ShopingCartIngredient, 'user_id', ids, keep)
+        Ingredient.objects.filter(id__in=ids).exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
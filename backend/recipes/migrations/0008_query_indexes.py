@@ -0,0 +1,68 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+INGREDIENT_PREFIX_INDEX = 'ingredient_name_prefix_idx'
+
+
+def make_tag_slugs_unique(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    duplicates = Tag.objects.values('slug').annotate(
+        keep=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for group in duplicates:
+        for tag in Tag.objects.filter(slug=group['slug']).exclude(
+            id=group['keep']
+        ):
+            tag.slug = f'{tag.slug[:190]}-{tag.id}'
+            tag.save(update_fields=['slug'])
+
+
+def create_ingredient_prefix_index(apps, schema_editor):
+    # istartswith превращается в UPPER(name) LIKE 'X%': такому запросу
+    # нужен индекс по выражению с text_pattern_ops, есть только в Postgres.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {INGREDIENT_PREFIX_INDEX} '
+            'ON recipes_ingredient (UPPER(name::text) text_pattern_ops)'
+        )
+
+
+def drop_ingredient_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'DROP INDEX IF EXISTS {INGREDIENT_PREFIX_INDEX}'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            make_tag_slugs_unique, migrations.RunPython.noop
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.SlugField(max_length=200, unique=True, verbose_name='Уникальный слаг'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-id'], name='recipe_author_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-in_carts_count', '-id'], name='recipe_in_carts_count_idx'),
+        ),
+        migrations.RunPython(
+            create_ingredient_prefix_index, drop_ingredient_prefix_index
+        ),
+    ]
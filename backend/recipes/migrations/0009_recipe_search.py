@@ -0,0 +1,66 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:52
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+SEARCH_INDEX = 'recipe_search_vector_idx'
+FTS_TABLE = 'recipes_recipe_fts'
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        config = settings.RECIPE_SEARCH_CONFIG
+        schema_editor.execute(
+            "UPDATE recipes_recipe r SET search_vector = "
+            "setweight(to_tsvector(%s::regconfig, r.name), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, r.text), 'B') || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(("
+            "SELECT string_agg(i.name, ' ') "
+            "FROM recipes_ingredientinrecipe ir "
+            "JOIN recipes_ingredient i ON i.id = ir.ingredient_id "
+            "WHERE ir.recipe_id = r.id), '')), 'C')",
+            [config, config, config],
+        )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_INDEX} '
+            'ON recipes_recipe USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+            'USING fts5(name, text, ingredients)'
+        )
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+            "SELECT r.id, r.name, r.text, coalesce(("
+            "SELECT group_concat(i.name, ' ') "
+            "FROM recipes_ingredientinrecipe ir "
+            "JOIN recipes_ingredient i ON i.id = ir.ingredient_id "
+            "WHERE ir.recipe_id = r.id), '') FROM recipes_recipe r"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX IF EXISTS {SEARCH_INDEX}')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
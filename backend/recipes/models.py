@@ -1,8 +1,13 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connections, models, transaction
+from django.db.models import (
+    BooleanField, Exists, F, OuterRef, Prefetch, Sum, UniqueConstraint, Value,
+)
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
+from users.models import CountersModel, Follow
 
 User = get_user_model()
 
@@ -23,7 +28,8 @@ class Tag(models.Model):
     )
     slug = models.SlugField(
         'Уникальный слаг',
-        max_length=200
+        max_length=200,
+        unique=True
     )
 
     class Meta:
@@ -48,12 +54,77 @@ class Ingredient(models.Model):
     class Meta:
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
+        constraints = [
+            UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient'
+            )
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+    '''Выборки рецептов для чтения через API.'''
+
+    def with_related(self):
+        '''Теги и ингредиенты загружаются фиксированным числом
+        запросов независимо от размера страницы.'''
+        return self.defer('search_vector').prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredientrecipes',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id'),
+            ),
+        )
+
+    def with_user_flags(self, user):
+        '''Аннотирует is_favorited, is_in_shopping_cart и подписку
+        на автора для текущего пользователя.'''
+        if user.is_anonymous:
+            return self.select_related('author').annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return self.annotate(**self._recipe_flags(user)).prefetch_related(
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(
+                    is_subscribed=Exists(Follow.objects.filter(
+                        user=user, author=OuterRef('pk')
+                    ))
+                ),
+            )
+        )
+
+    def with_flat_user_flags(self, user):
+        '''То же без prefetch_related, который недоступен при асинхронной
+        итерации: подписка на автора аннотируется на сам рецепт
+        как author_is_subscribed.'''
+        if user.is_anonymous:
+            return self.with_user_flags(user)
+        return self.select_related('author').annotate(
+            author_is_subscribed=Exists(Follow.objects.filter(
+                user=user, author=OuterRef('author')
+            )),
+            **self._recipe_flags(user),
+        )
+
+    def _recipe_flags(self, user):
+        return {
+            'is_favorited': Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            'is_in_shopping_cart': Exists(ShopingCart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        }
+
+
+class Recipe(CountersModel):
     '''Список рецептов.'''
     tags = models.ManyToManyField(
         Tag,
@@ -82,6 +153,12 @@ class Recipe(models.Model):
         null=True,
         blank=True
     )
+    image_variants = models.JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False
+    )
     text = models.TextField(
         max_length=256,
         verbose_name='Описание'
@@ -97,10 +174,48 @@ class Recipe(models.Model):
         ]
     )
 
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['author', '-id'],
+                name='recipe_author_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-id'],
+                name='recipe_favorites_count_idx'
+            ),
+            models.Index(
+                fields=['-in_carts_count', '-id'],
+                name='recipe_in_carts_count_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -200,3 +315,167 @@ class ShopingCart(models.Model):
 
     def __str__(self):
         return f"{self.user} has {self.recipe}"
+
+
+class ShopingCartIngredientQuerySet(models.QuerySet):
+    '''Инкрементальное обновление агрегированного списка покупок.'''
+
+    def apply(self, user_ids, amounts):
+        '''Прибавляет amounts ({ingredient_id: delta}) к итогам
+        каждого из пользователей, удаляя обнулившиеся строки.'''
+        amounts = {
+            ingredient_id: delta
+            for ingredient_id, delta in amounts.items() if delta
+        }
+        user_ids = list(user_ids)
+        if not amounts or not user_ids:
+            return
+        with transaction.atomic():
+            rows = {
+                (row.user_id, row.ingredient_id): row
+                for row in self.select_for_update().filter(
+                    user_id__in=user_ids, ingredient_id__in=amounts
+                )
+            }
+            to_create, to_update, to_delete = [], [], []
+            for user_id in user_ids:
+                for ingredient_id, delta in amounts.items():
+                    row = rows.get((user_id, ingredient_id))
+                    if row is None:
+                        if delta > 0:
+                            to_create.append(self.model(
+                                user_id=user_id,
+                                ingredient_id=ingredient_id,
+                                amount=delta,
+                            ))
+                        continue
+                    row.amount += delta
+                    if row.amount > 0:
+                        to_update.append(row)
+                    else:
+                        to_delete.append(row.pk)
+            self._insert_or_add(to_create)
+            self.bulk_update(to_update, ['amount'])
+            if to_delete:
+                self.filter(pk__in=to_delete).delete()
+
+    def _insert_or_add(self, rows):
+        '''Вставляет строки; если строку того же пользователя и
+        ингредиента успела вставить параллельная транзакция, прибавляет
+        количество к ней (select_for_update новые строки не блокирует).'''
+        if not rows:
+            return
+        connection = connections[self.db]
+        table = connection.ops.quote_name(self.model._meta.db_table)
+        fields = ['user_id', 'ingredient_id', 'amount']
+        batch_size = connection.ops.bulk_batch_size(fields, rows)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                cursor.execute(
+                    f'INSERT INTO {table} ({", ".join(fields)}) VALUES '
+                    + ', '.join(['(%s, %s, %s)'] * len(batch))
+                    + ' ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+                    f'SET amount = {table}.amount + EXCLUDED.amount',
+                    [
+                        value for row in batch
+                        for value in (row.user_id, row.ingredient_id,
+                                      row.amount)
+                    ],
+                )
+
+    def add_recipe(self, user_id, recipe_id, sign=1):
+        self.apply([user_id], {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in IngredientInRecipe.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('ingredient_id', 'amount')
+        })
+
+    def remove_recipe(self, user_id, recipe_id):
+        self.add_recipe(user_id, recipe_id, sign=-1)
+
+    def add_ingredient(self, recipe_id, ingredient_id, amount):
+        self.apply(
+            ShopingCart.objects.filter(recipe_id=recipe_id).values_list(
+                'user_id', flat=True
+            ),
+            {ingredient_id: amount},
+        )
+
+    def aggregate_from_carts(self):
+        '''Итоги, посчитанные заново по корзинам:
+        {(user_id, ingredient_id): amount}.'''
+        return {
+            (row['recipe__shopingcarts__user'], row['ingredient']):
+                row['total']
+            for row in IngredientInRecipe.objects.filter(
+                recipe__shopingcarts__isnull=False
+            ).values(
+                'recipe__shopingcarts__user', 'ingredient'
+            ).annotate(total=Sum('amount')).order_by()
+        }
+
+
+class ShopingCartIngredient(models.Model):
+    '''Суммарное количество ингредиента в списке покупок пользователя.'''
+    user = models.ForeignKey(
+        User,
+        related_name='shopingcart_ingredients',
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShopingCartIngredientQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списке покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name="unique_shopingcart_ingredient"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.ingredient} {self.amount}"
+
+
+class CatalogVersionQuerySet(models.QuerySet):
+
+    def bump(self, catalog):
+        if not self.filter(catalog=catalog).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        ):
+            self.get_or_create(catalog=catalog)
+
+
+class CatalogVersion(models.Model):
+    '''Версия справочника (теги, ингредиенты) для условных
+    GET-запросов.'''
+    TAGS = 'tags'
+    INGREDIENTS = 'ingredients'
+
+    catalog = models.CharField(
+        'Справочник',
+        max_length=50,
+        unique=True
+    )
+    version = models.PositiveBigIntegerField('Версия', default=0)
+    updated_at = models.DateTimeField('Дата изменения', auto_now=True)
+
+    objects = CatalogVersionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f"{self.catalog} v{self.version}"
@@ -0,0 +1,108 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector,
+)
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+
+from .models import IngredientInRecipe, Recipe
+
+FTS_TABLE = 'recipes_recipe_fts'
+# Веса названия, описания и ингредиентов для bm25 в SQLite.
+FTS_WEIGHTS = '10.0, 4.0, 1.0'
+WORD = re.compile(r'\w+')
+
+
+def _ingredient_names():
+    '''Названия ингредиентов рецепта одной строкой (Postgres).'''
+    return Coalesce(
+        Subquery(
+            IngredientInRecipe.objects.filter(recipe=OuterRef('pk'))
+            .order_by()
+            .values('recipe')
+            .annotate(names=StringAgg(
+                'ingredient__name', delimiter=' ', output_field=TextField()
+            ))
+            .values('names')
+        ),
+        Value(''),
+        output_field=TextField(),
+    )
+
+
+def _fts_query(text):
+    '''Запрос FTS5: все слова обязательны, каждое как префикс.'''
+    return ' '.join(f'"{word}"*' for word in WORD.findall(text))
+
+
+def index_recipes(recipe_ids):
+    '''Пересчитывает поисковый индекс для рецептов.'''
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    if connection.vendor == 'postgresql':
+        config = settings.RECIPE_SEARCH_CONFIG
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=(
+                SearchVector('name', weight='A', config=config)
+                + SearchVector('text', weight='B', config=config)
+                + SearchVector(_ingredient_names(), weight='C', config=config)
+            )
+        )
+    elif connection.vendor == 'sqlite':
+        names = {}
+        for recipe_id, name in IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient__name'):
+            names.setdefault(recipe_id, []).append(name)
+        rows = [
+            (pk, name, text, ' '.join(names.get(pk, ())))
+            for pk, name, text in Recipe.objects.filter(
+                pk__in=recipe_ids
+            ).values_list('pk', 'name', 'text')
+        ]
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids,
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, text, ingredients) '
+                'VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+
+
+def search(queryset, text):
+    '''Рецепты, подходящие под запрос, от более релевантных к менее.
+
+    Уже заданный порядок (?ordering=) остаётся главным, релевантность
+    решает при равенстве, последним идёт -id.'''
+    ordering = [field for field in queryset.query.order_by if field != '-id']
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(
+            text, config=settings.RECIPE_SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ).order_by(*ordering, '-rank', '-id')
+    if connection.vendor == 'sqlite':
+        query = _fts_query(text)
+        if not query:
+            return queryset.none()
+        table = Recipe._meta.db_table
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [query],
+        )).annotate(rank=RawSQL(
+            f'SELECT -bm25({FTS_TABLE}, {FTS_WEIGHTS}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id',
+            [query],
+        )).order_by(*ordering, '-rank', '-id')
+    return queryset.filter(name__icontains=text)
@@ -0,0 +1,114 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from users.models import Follow, User
+
+from .images import forget_variants
+from .models import (
+    CatalogVersion, Favorite, Ingredient, IngredientInRecipe, Recipe,
+    ShopingCart, ShopingCartIngredient, Tag,
+)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    CatalogVersion.objects.bump(CatalogVersion.TAGS)
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    CatalogVersion.objects.bump(CatalogVersion.INGREDIENTS)
+
+
+def _change_counter(model, pk, field, delta):
+    '''Атомарно меняет счётчик в базе; ниже нуля он не опускается,
+    даже если успел разойтись со связанными записями.'''
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+COUNTERS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    ShopingCart: (Recipe, 'recipe_id', 'in_carts_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Follow: (User, 'author_id', 'followers_count'),
+}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShopingCart)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        model, attname, field = COUNTERS[sender]
+        _change_counter(model, getattr(instance, attname), field, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShopingCart)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def decrement_counter(sender, instance, **kwargs):
+    model, attname, field = COUNTERS[sender]
+    _change_counter(model, getattr(instance, attname), field, -1)
+
+
+# Поля строки, от которых зависят итоги списков покупок.
+SHOPPING_LIST_FIELDS = {
+    ShopingCart: ('user_id', 'recipe_id'),
+    IngredientInRecipe: ('recipe_id', 'ingredient_id', 'amount'),
+}
+
+
+def _change_shopping_lists(row, sign):
+    if isinstance(row, ShopingCart):
+        ShopingCartIngredient.objects.add_recipe(
+            row.user_id, row.recipe_id, sign
+        )
+    else:
+        ShopingCartIngredient.objects.add_ingredient(
+            row.recipe_id, row.ingredient_id, sign * row.amount
+        )
+
+
+@receiver(pre_save, sender=ShopingCart)
+@receiver(pre_save, sender=IngredientInRecipe)
+def remember_previous_row(sender, instance, **kwargs):
+    '''Прежнее состояние изменяемой строки (например, в админке),
+    чтобы вычесть его из списков покупок.'''
+    instance._previous_row = None if instance._state.adding else (
+        sender.objects.filter(pk=instance.pk).first()
+    )
+
+
+@receiver(post_save, sender=ShopingCart)
+@receiver(post_save, sender=IngredientInRecipe)
+def add_to_shopping_lists(sender, instance, **kwargs):
+    previous = instance.__dict__.pop('_previous_row', None)
+    if previous is not None:
+        if all(
+            getattr(previous, field) == getattr(instance, field)
+            for field in SHOPPING_LIST_FIELDS[sender]
+        ):
+            return
+        _change_shopping_lists(previous, -1)
+    _change_shopping_lists(instance, 1)
+
+
+@receiver(post_delete, sender=ShopingCart)
+@receiver(post_delete, sender=IngredientInRecipe)
+def subtract_from_shopping_lists(sender, instance, **kwargs):
+    '''Вызывается и при каскадном удалении рецепта или пользователя.
+    Пара корзина–ингредиент вычитается один раз: тем сигналом, который
+    пришёл вторым, когда другой строки в базе уже нет.'''
+    _change_shopping_lists(instance, -1)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(sender, instance, **kwargs):
+    forget_variants(instance.image_variants)
@@ -0,0 +1,86 @@
+import pytest
+
+from django.core.cache import caches
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    '''Списки для анонимов и токены не переживают тест.'''
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        email='reader@foodgram.ru', username='reader',
+        first_name='Читатель', last_name='Рецептов', password='password',
+    )
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def user_client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def recipes(user):
+    '''Шесть рецептов трёх авторов; читатель подписан на двоих из них,
+    два рецепта у него в избранном и в корзине.'''
+    tags = [
+        Tag.objects.create(name=name, color=color, slug=slug)
+        for name, color, slug in (
+            ('Завтрак', '#E26C2D', 'breakfast'),
+            ('Обед', '#49B64E', 'lunch'),
+            ('Ужин', '#8775D2', 'dinner'),
+        )
+    ]
+    ingredients = [
+        Ingredient.objects.create(name=f'ингредиент {i}', measurement_unit='г')
+        for i in range(5)
+    ]
+    authors = [
+        User.objects.create_user(
+            email=f'author{i}@foodgram.ru', username=f'author{i}',
+            first_name='Автор', last_name=str(i), password='password',
+        )
+        for i in range(3)
+    ]
+    recipes = []
+    for i in range(6):
+        recipe = Recipe.objects.create(
+            author=authors[i % 3], name=f'Рецепт {i}', text='Описание',
+            cooking_time=i + 1,
+        )
+        # Теги добавляются не по порядку id, чтобы порядок связей
+        # отличался от порядка тегов.
+        for tag in reversed(tags[i % 2:]):
+            recipe.tags.add(tag)
+        for ingredient in reversed(ingredients[i % 3:]):
+            IngredientInRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=10 * (i + 1),
+            )
+        recipes.append(recipe)
+    for author in authors[:2]:
+        Follow.objects.create(user=user, author=author)
+    for recipe in recipes[:2]:
+        user.favorites.create(recipe=recipe)
+        user.shopingcarts.create(recipe=recipe)
+    return recipes
@@ -0,0 +1,71 @@
+import pytest
+
+from api import async_views
+from api.views import RecipeViewSet
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+from users.views import CustomUserViewSet
+
+pytestmark = pytest.mark.django_db
+
+RECIPE_LIST = RecipeViewSet.as_view({'get': 'list'})
+RECIPE_DETAIL = RecipeViewSet.as_view({'get': 'retrieve'})
+SUBSCRIPTIONS = CustomUserViewSet.as_view(
+    {'get': 'subscriptions'}, **CustomUserViewSet.subscriptions.kwargs
+)
+
+
+def responses(sync_view, async_view, path, token=None, **kwargs):
+    '''Тела ответов обычного и асинхронного представлений.'''
+    headers = {'HTTP_AUTHORIZATION': f'Token {token.key}'} if token else {}
+    response = sync_view(RequestFactory().get(path, **headers), **kwargs)
+    response.render()
+    async_response = async_to_sync(async_view)(
+        RequestFactory().get(path, **headers), **kwargs
+    )
+    assert async_response is not None
+    assert response.status_code == async_response.status_code == 200
+    return response.content, async_response.content
+
+
+@pytest.mark.parametrize('path', [
+    '/api/recipes/',
+    '/api/recipes/?limit=2&page=2',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?tags=breakfast&tags=dinner',
+])
+@pytest.mark.parametrize('authenticated', [False, True])
+def test_recipe_list(recipes, token, path, authenticated):
+    sync, async_ = responses(
+        RECIPE_LIST, async_views.recipe_list, path,
+        token if authenticated else None,
+    )
+    assert sync == async_
+
+
+def test_recipe_list_author(recipes, token):
+    sync, async_ = responses(
+        RECIPE_LIST, async_views.recipe_list,
+        f'/api/recipes/?author={recipes[0].author_id}', token,
+    )
+    assert sync == async_
+
+
+@pytest.mark.parametrize('authenticated', [False, True])
+def test_recipe_detail(recipes, token, authenticated):
+    for recipe in recipes:
+        sync, async_ = responses(
+            RECIPE_DETAIL, async_views.recipe_detail,
+            f'/api/recipes/{recipe.pk}/', token if authenticated else None,
+            pk=recipe.pk,
+        )
+        assert sync == async_
+
+
+@pytest.mark.parametrize('query', ['', '?recipes_limit=1'])
+def test_subscriptions(recipes, token, query):
+    sync, async_ = responses(
+        SUBSCRIPTIONS, async_views.subscriptions,
+        f'/api/users/subscriptions/{query}', token,
+    )
+    assert sync == async_
@@ -0,0 +1,58 @@
+import pytest
+
+from api.cache import ALL, VERSION_PREFIX
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+pytestmark = pytest.mark.django_db
+
+
+def author_names(response):
+    return [recipe['author']['first_name'] for recipe in response.data[
+        'results'
+    ]]
+
+
+@pytest.mark.parametrize('author', ['{pk}', '0{pk}'])
+def test_author_change_resets_anonymous_list(
+    recipes, django_capture_on_commit_callbacks, author,
+):
+    client = APIClient()
+    recipe = recipes[0]
+    url = '/api/recipes/?author=' + author.format(pk=recipe.author_id)
+    assert set(author_names(client.get(url))) == {'Автор'}
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.author.first_name = 'Переименован'
+        recipe.author.save()
+    assert set(author_names(client.get(url))) == {'Переименован'}
+    tagged = client.get('/api/recipes/?tags=dinner')
+    assert 'Переименован' in author_names(tagged)
+
+
+def test_favorite_resets_popular_list(
+    recipes, user, django_capture_on_commit_callbacks,
+):
+    client = APIClient()
+    recipe = recipes[2]
+    url = f'/api/recipes/?author={recipe.author_id}&ordering=-favorites_count'
+    assert client.get(url).data['results'][0]['id'] != recipe.id
+    with django_capture_on_commit_callbacks(execute=True):
+        for reader in range(3):
+            recipe.favorites.create(user=user.__class__.objects.create_user(
+                email=f'fan{reader}@foodgram.ru', username=f'fan{reader}',
+                password='password',
+            ))
+    assert client.get(url).data['results'][0]['id'] == recipe.id
+
+
+def test_favorite_keeps_plain_lists(
+    recipes, user, django_capture_on_commit_callbacks,
+):
+    keys = [
+        VERSION_PREFIX + key
+        for key in (ALL, f'author:{recipes[2].author_id}', 'tag:dinner')
+    ]
+    before = cache.get_many(keys)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipes[2].favorites.create(user=user)
+    assert cache.get_many(keys) == before
@@ -0,0 +1,26 @@
+import pytest
+
+from django.core.management import CommandError, call_command
+from recipes.management.benchmarking import percentile
+from recipes.models import Recipe
+
+pytestmark = pytest.mark.django_db
+
+
+def test_repair_counters_check(recipes):
+    call_command('repair_counters', '--check')
+    Recipe.objects.filter(pk=recipes[0].pk).update(favorites_count=5)
+    with pytest.raises(CommandError):
+        call_command('repair_counters', '--check')
+    call_command('repair_counters')
+    call_command('repair_counters', '--check')
+    recipes[0].refresh_from_db()
+    assert recipes[0].favorites_count == 1
+
+
+def test_percentile_sorts_values():
+    values = [5, 1, 4, 2, 3]
+    assert percentile(values, 0.5) == 3
+    assert percentile(values, 1) == 5
+    assert percentile([], 0.95) == 0
+    assert values == [5, 1, 4, 2, 3]
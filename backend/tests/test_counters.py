@@ -0,0 +1,41 @@
+import pytest
+
+from api.serializers import RecipeSerializer
+from recipes.models import Favorite, Recipe
+from rest_framework.test import APIRequestFactory
+from users.models import Follow, User
+
+pytestmark = pytest.mark.django_db
+
+
+def test_recipe_update_keeps_counters(recipes, user):
+    stale = Recipe.objects.get(pk=recipes[2].pk)
+    Favorite.objects.create(user=user, recipe=stale)
+    request = APIRequestFactory().patch('/')
+    request.user = stale.author
+    serializer = RecipeSerializer(stale, data={
+        'name': 'Новое название',
+        'text': stale.text,
+        'cooking_time': stale.cooking_time,
+        'tags': [tag.pk for tag in stale.tags.all()],
+        'ingredients': [
+            {'id': row.ingredient_id, 'amount': row.amount}
+            for row in stale.ingredientrecipes.all()
+        ],
+    }, partial=True, context={'request': request})
+    assert serializer.is_valid(), serializer.errors
+    serializer.save()
+    recipe = Recipe.objects.get(pk=stale.pk)
+    assert recipe.name == 'Новое название'
+    assert recipe.favorites_count == 1
+
+
+def test_user_save_keeps_counters(recipes, user):
+    stale = User.objects.get(pk=recipes[2].author_id)
+    Follow.objects.create(user=user, author=stale)
+    Recipe.objects.create(author=stale, name='Ещё', text='-')
+    stale.first_name = 'Другое'
+    stale.save()
+    author = User.objects.get(pk=stale.pk)
+    assert author.first_name == 'Другое'
+    assert (author.recipes_count, author.followers_count) == (3, 1)
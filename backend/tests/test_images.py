@@ -0,0 +1,75 @@
+import pytest
+
+from django.core.files.storage import default_storage
+from recipes.images import generate_variants
+from recipes.models import Recipe
+from rest_framework.test import APIClient
+
+pytestmark = pytest.mark.django_db
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAQMAAAAl21bKAAAAA'
+    '1BMVEUAAACnej3aAAAAAXRSTlMAQObYZgAAAApJREFUCNdjYAAAAAIAAeIhvDMAAAAASU'
+    'VORK5CYII='
+)
+
+
+def variant_files(recipe):
+    recipe.refresh_from_db()
+    return [
+        name for formats in recipe.image_variants.values()
+        for name in formats.values()
+    ]
+
+
+@pytest.fixture
+def author_client(recipes, monkeypatch):
+    # Копии делаются в тесте сразу, без фонового пула.
+    monkeypatch.setattr('api.serializers.schedule_variants', lambda _: None)
+    client = APIClient()
+    client.force_authenticate(recipes[0].author)
+    return client
+
+
+def upload(client, recipe):
+    response = client.patch(f'/api/recipes/{recipe.pk}/', {
+        'image': PNG,
+        'name': recipe.name,
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+        'tags': [tag.pk for tag in recipe.tags.all()],
+        'ingredients': [
+            {'id': row.ingredient_id, 'amount': row.amount}
+            for row in recipe.ingredientrecipes.all()
+        ],
+    }, format='json')
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image_variants=generate_variants(recipe.image.name)
+    )
+    return variant_files(recipe)
+
+
+def test_image_change_deletes_old_variants(
+    recipes, author_client, django_capture_on_commit_callbacks,
+):
+    recipe = recipes[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        old = upload(author_client, recipe)
+    assert old and all(default_storage.exists(name) for name in old)
+    with django_capture_on_commit_callbacks(execute=True):
+        new = upload(author_client, recipe)
+    assert not any(default_storage.exists(name) for name in old)
+    assert all(default_storage.exists(name) for name in new)
+
+
+def test_recipe_delete_deletes_variants(
+    recipes, author_client, django_capture_on_commit_callbacks,
+):
+    recipe = recipes[0]
+    with django_capture_on_commit_callbacks(execute=True):
+        files = upload(author_client, recipe)
+        recipe.delete()
+    assert files
+    assert not any(default_storage.exists(name) for name in files)
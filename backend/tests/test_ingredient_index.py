@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from api import async_views
+from asgiref.sync import async_to_sync
+from django.test import RequestFactory
+from recipes.models import CatalogVersion, Ingredient
+from rest_framework.test import APIClient
+
+pytestmark = pytest.mark.django_db
+
+URL = '/api/ingredients/?name=соль'
+
+
+def names(response):
+    return [ingredient['name'] for ingredient in json.loads(response.content)]
+
+
+def async_get(path, **headers):
+    return async_to_sync(async_views.ingredient_list_view)(
+        RequestFactory().get(path, **headers)
+    )
+
+
+@pytest.mark.parametrize('get', [APIClient().get, async_get])
+def test_catalog_change_without_signals(get):
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    response = get(URL)
+    assert names(response) == ['соль']
+    etag = response['ETag']
+    # Как load_ingredients: запись без сигналов и сдвиг версии.
+    Ingredient.objects.bulk_create([
+        Ingredient(name='соль морская', measurement_unit='г')
+    ])
+    CatalogVersion.objects.bump(CatalogVersion.INGREDIENTS)
+    response = get(URL, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert names(response) == ['соль', 'соль морская']
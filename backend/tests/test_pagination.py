@@ -0,0 +1,25 @@
+import pytest
+
+from rest_framework.test import APIClient
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize('query', [
+    'pagination=cursor&ordering=-favorites_count',
+    'pagination=cursor&search=рецепт',
+    'cursor=cD0x&ordering=-in_carts_count',
+])
+def test_cursor_rejects_own_ordering(recipes, user_client, query):
+    for client in (APIClient(), user_client):
+        response = client.get(f'/api/recipes/?{query}')
+        assert response.status_code == 400
+
+
+def test_cursor_pages(recipes, user_client):
+    response = user_client.get('/api/recipes/?pagination=cursor&limit=4')
+    assert response.status_code == 200
+    ids = [recipe['id'] for recipe in response.data['results']]
+    response = user_client.get(response.data['next'])
+    ids += [recipe['id'] for recipe in response.data['results']]
+    assert ids == sorted((recipe.id for recipe in recipes), reverse=True)
@@ -0,0 +1,116 @@
+import pytest
+
+from api.serializers import RecipeReadSerializer, RecipeSerializer
+from django.contrib.auth.models import AnonymousUser
+from recipes.management.commands.benchmark_api import (
+    READS, RECIPE_WRITES, WRITES, Command, recipe_payloads,
+)
+from recipes.models import Recipe
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from users.authentication import token_cache
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.mark.parametrize('path', [
+    '/api/recipes/',
+    '/api/recipes/?limit=100',
+    '/api/recipes/?is_favorited=1&is_in_shopping_cart=1',
+    '/api/recipes/?tags=breakfast&tags=lunch',
+])
+def test_recipe_list_queries(
+    recipes, user_client, django_assert_max_num_queries, path,
+):
+    # Индекс тегов загружается первым запросом и живёт в процессе.
+    user_client.get(path)
+    # Токен, подписки, COUNT, рецепты, теги, ингредиенты.
+    with django_assert_max_num_queries(6):
+        assert user_client.get(path).status_code == 200
+    with django_assert_max_num_queries(4):
+        assert APIClient().get(path).status_code == 200
+
+
+@pytest.mark.parametrize('query', ['', '?recipes_limit=1&limit=100'])
+def test_subscriptions_queries(
+    recipes, user_client, django_assert_max_num_queries, query,
+):
+    # Токен, COUNT, авторы, их рецепты.
+    with django_assert_max_num_queries(4):
+        response = user_client.get(f'/api/users/subscriptions/{query}')
+    assert response.status_code == 200
+    assert response.data['count'] == 2
+
+
+@pytest.mark.parametrize('authenticated', [False, True])
+def test_read_serializer_matches(recipes, user, authenticated):
+    viewer = user if authenticated else AnonymousUser()
+    request = APIRequestFactory().get('/api/recipes/')
+    request.user = viewer
+    page = list(Recipe.objects.with_related().with_user_flags(viewer))
+    rendered = [
+        JSONRenderer().render(serializer(
+            page, many=True, context={'request': request}
+        ).data)
+        for serializer in (RecipeSerializer, RecipeReadSerializer)
+    ]
+    assert rendered[0] == rendered[1]
+
+
+@pytest.fixture
+def params(recipes, user):
+    return Command().params(user)
+
+
+@pytest.mark.parametrize(
+    'url, auth, budget',
+    [(url, auth, budget) for _, _, url, auth, budget in READS],
+    ids=[read[0] for read in READS],
+)
+def test_read_budgets(
+    params, user_client, django_assert_max_num_queries, url, auth, budget,
+):
+    # Пределы те же, что проверяет benchmark_api на больших данных.
+    client = user_client if auth else APIClient()
+    url = url.format(**params)
+    client.get(url)
+    budget += auth * (token_cache() is None)
+    with django_assert_max_num_queries(budget):
+        response = client.get(url)
+        if hasattr(response, 'streaming_content'):
+            b''.join(response.streaming_content)
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    'method, url, budget',
+    [(method, url, budget) for _, method, url, budget in WRITES],
+    ids=[write[0] for write in WRITES],
+)
+def test_write_budgets(
+    params, user_client, django_assert_max_num_queries, method, url, budget,
+):
+    url = url.format(**params)
+    if method == 'delete':
+        user_client.post(url)
+    with django_assert_max_num_queries(budget):
+        response = getattr(user_client, method)(url)
+    assert response.status_code < 300
+
+
+def test_recipe_write_budgets(
+    recipes, user_client, django_assert_max_num_queries,
+):
+    payload, update = recipe_payloads()
+    with django_assert_max_num_queries(RECIPE_WRITES['recipes-create']):
+        response = user_client.post('/api/recipes/', payload, format='json')
+    assert response.status_code == 201
+    url = f'/api/recipes/{response.json()["id"]}/'
+    with django_assert_max_num_queries(
+        RECIPE_WRITES['recipes-partial_update']
+    ):
+        response = user_client.patch(url, update, format='json')
+    assert response.status_code == 200
+    with django_assert_max_num_queries(RECIPE_WRITES['recipes-destroy']):
+        response = user_client.delete(url)
+    assert response.status_code == 204
@@ -0,0 +1,94 @@
+import pytest
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != 'postgresql',
+        reason='Планы запросов проверяются на Postgres',
+    ),
+]
+
+# Маленькие справочники, которые отдаются целиком.
+FULL_READS = {'recipes_tag', 'recipes_catalogversion'}
+# Способы чтения, которыми план может пройти таблицу целиком.
+SCANS = ('enable_seqscan', 'enable_indexscan')
+INDEX_SCANS = {'Index Scan', 'Index Only Scan'}
+URLS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=2&page=2',
+    '/api/recipes/?pagination=cursor',
+    '/api/recipes/?author={author}',
+    '/api/recipes/?is_favorited=1',
+    '/api/recipes/?is_in_shopping_cart=1',
+    '/api/recipes/?is_favorited=1&tags=breakfast&tags=lunch',
+    '/api/recipes/?ordering=-favorites_count',
+    '/api/recipes/?ordering=-in_carts_count',
+    '/api/recipes/?search=рецепт',
+    '/api/recipes/{recipe}/',
+    '/api/recipes/download_shopping_cart/',
+    '/api/users/',
+    '/api/users/{author}/',
+    '/api/users/subscriptions/?recipes_limit=3',
+    '/api/tags/',
+    '/api/ingredients/{ingredient}/',
+)
+
+
+def plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def full_reads(sql, params=None):
+    '''Таблицы, которые план читает целиком: последовательно или
+    проходом по всему индексу с отбором строк фильтром. Оба способа
+    запрещены, поэтому остаются в плане, только если подходящего
+    индекса нет вовсе.'''
+    with connection.cursor() as cursor:
+        for setting in SCANS:
+            cursor.execute(f'SET LOCAL {setting} = off')
+        try:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0][0]['Plan']
+        finally:
+            for setting in SCANS:
+                cursor.execute(f'RESET {setting}')
+    return {
+        node['Relation Name'] for node in plan_nodes(plan)
+        if node['Node Type'] == 'Seq Scan' or (
+            node['Node Type'] in INDEX_SCANS
+            and 'Filter' in node and 'Index Cond' not in node
+        )
+    } - FULL_READS
+
+
+@pytest.mark.parametrize('url', URLS)
+def test_api_queries_use_indexes(recipes, user_client, url):
+    url = url.format(
+        author=recipes[0].author_id,
+        recipe=recipes[0].pk,
+        ingredient=Ingredient.objects.first().pk,
+    )
+    with CaptureQueriesContext(connection) as context:
+        response = user_client.get(url)
+    assert response.status_code == 200
+    if hasattr(response, 'streaming_content'):
+        b''.join(response.streaming_content)
+    for query in context.captured_queries:
+        sql = query['sql']
+        if sql.lstrip().upper().startswith('SELECT'):
+            assert not full_reads(sql), sql
+
+
+def test_ingredient_prefix_fallback_uses_index(recipes):
+    # Поиск по началу названия в API идёт по индексу в памяти,
+    # но запасной путь через базу тоже должен попадать в индекс.
+    sql, params = Ingredient.objects.filter(
+        name__istartswith='ингр'
+    ).query.sql_with_params()
+    assert not full_reads(sql, params)
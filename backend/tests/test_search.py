@@ -0,0 +1,32 @@
+import pytest
+
+from recipes.models import Recipe
+from recipes.search import index_recipes
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def indexed(recipes):
+    index_recipes([recipe.pk for recipe in recipes])
+    return recipes
+
+
+def ids(response):
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.data['results']]
+
+
+def test_search_orders_by_rank(indexed, user_client):
+    Recipe.objects.filter(pk=indexed[3].pk).update(name='Ужин')
+    index_recipes([indexed[3].pk])
+    found = ids(user_client.get('/api/recipes/?search=ужин&limit=100'))
+    assert found == [indexed[3].pk]
+
+
+def test_search_keeps_requested_ordering(indexed, user_client):
+    found = ids(user_client.get(
+        '/api/recipes/?search=рецепт&ordering=-favorites_count&limit=100'
+    ))
+    assert len(found) == len(indexed)
+    assert found[:2] == [indexed[1].pk, indexed[0].pk]
@@ -0,0 +1,99 @@
+import threading
+
+import pytest
+
+from django.db import connection, connections, transaction
+from recipes.models import ShopingCartIngredient
+from rest_framework.test import APIClient
+
+pytestmark = pytest.mark.django_db
+URL = '/api/recipes/download_shopping_cart/'
+
+
+def totals(user):
+    return dict(
+        ShopingCartIngredient.objects.filter(user=user).values_list(
+            'ingredient_id', 'amount'
+        )
+    )
+
+
+@pytest.mark.parametrize('fmt, content_type', [
+    ('txt', 'text/plain; charset=utf-8'),
+    ('csv', 'text/csv; charset=utf-8'),
+    ('pdf', 'application/pdf'),
+])
+def test_download(recipes, user_client, fmt, content_type):
+    response = user_client.get(f'{URL}?format={fmt}')
+    assert response.status_code == 200
+    assert response['Content-Type'] == content_type
+    assert b''.join(response.streaming_content)
+
+
+@pytest.mark.parametrize('fmt', ['', '?format=pdf'])
+def test_download_errors_are_json(recipes, user, user_client, fmt):
+    response = APIClient().get(URL + fmt)
+    assert response.status_code == 401
+    assert response['Content-Type'] == 'application/json'
+    assert 'detail' in response.json()
+    user.shopingcarts.all().delete()
+    response = user_client.get(URL + fmt)
+    assert response.status_code == 400
+    assert response['Content-Type'] == 'application/json'
+    assert 'errors' in response.json()
+
+
+def test_download_not_acceptable_is_json(recipes, user_client):
+    response = user_client.get(URL, HTTP_ACCEPT='application/json')
+    assert response.status_code == 406
+    assert response['Content-Type'] == 'application/json'
+
+
+def test_apply_adds_and_removes(recipes, user):
+    ingredient = recipes[0].ingredients.first()
+    amount = totals(user)[ingredient.pk]
+    ShopingCartIngredient.objects.apply([user.pk], {ingredient.pk: 7})
+    assert totals(user)[ingredient.pk] == amount + 7
+    ShopingCartIngredient.objects.apply(
+        [user.pk], {ingredient.pk: -amount - 7}
+    )
+    assert ingredient.pk not in totals(user)
+    ShopingCartIngredient.objects.apply([user.pk], {ingredient.pk: 5})
+    assert totals(user)[ingredient.pk] == 5
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='SQLite не пускает две пишущие транзакции одновременно',
+)
+def test_concurrent_first_inserts_add_up(recipes, user):
+    # Обе транзакции не видят строки друг друга, и select_for_update
+    # ничего не блокирует: вторая вставка должна дождаться первой
+    # и прибавить своё количество, а не упасть на уникальности.
+    ingredient = recipes[0].ingredients.first()
+    ShopingCartIngredient.objects.filter(user=user).delete()
+    inserted, errors = threading.Event(), []
+
+    def first():
+        try:
+            with transaction.atomic():
+                ShopingCartIngredient.objects.apply(
+                    [user.pk], {ingredient.pk: 5}
+                )
+                inserted.set()
+                # Держит транзакцию открытой, пока вторая ждёт на вставке.
+                threading.Event().wait(0.5)
+        except Exception as error:
+            errors.append(error)
+            inserted.set()
+        finally:
+            connections.close_all()
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    inserted.wait()
+    ShopingCartIngredient.objects.apply([user.pk], {ingredient.pk: 7})
+    thread.join()
+    assert not errors
+    assert totals(user)[ingredient.pk] == 12
@@ -0,0 +1,115 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+TOKEN_CACHE_PREFIX = 'auth:token:'
+# Поля пользователя, которые кладутся в JWT: их хватает всем
+# представлениям для чтения.
+USER_CLAIMS = ('email', 'username', 'first_name', 'last_name', 'is_staff')
+
+
+def token_cache():
+    '''Кеш пользователей по токенам или None, если он выключен.'''
+    if not settings.AUTH_TOKEN_CACHE:
+        return None
+    return caches[settings.AUTH_TOKEN_CACHE]
+
+
+def _cache_key(key):
+    # Сам токен в ключ кеша не попадает.
+    return TOKEN_CACHE_PREFIX + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(keys):
+    cache = token_cache()
+    if cache is not None:
+        cache.delete_many([_cache_key(key) for key in keys])
+
+
+async def aget_token_user(key):
+    '''Активный пользователь по ключу токена или None — то же, что
+    CachedTokenAuthentication, через асинхронные кеш и ORM.'''
+    cache = token_cache()
+    user = None
+    if cache is not None:
+        user = await cache.aget(_cache_key(key))
+    if user is None:
+        token = await Token.objects.select_related('user').filter(
+            key=key
+        ).afirst()
+        if token is None or not token.user.is_active:
+            return None
+        user = token.user
+        if cache is not None:
+            await cache.aset(
+                _cache_key(key), user, settings.AUTH_TOKEN_CACHE_TIMEOUT
+            )
+    return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    '''TokenAuthentication, который для чтения берёт пользователя из кеша
+    AUTH_TOKEN_CACHE вместо запроса Token JOIN User.
+
+    Кеш сбрасывается сигналами при выходе, смене пароля и любом другом
+    сохранении пользователя; queryset.update() сигналов не шлёт.
+    Запросы на запись всегда читают пользователя из базы: сохранение
+    закешированной копии затёрло бы счётчики, изменённые с тех пор.
+    Без AUTH_TOKEN_CACHE работает как обычный TokenAuthentication.
+    '''
+
+    def authenticate(self, request):
+        self.use_cache = request.method in SAFE_METHODS
+        return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        cache = token_cache()
+        if cache is None or not self.use_cache:
+            return super().authenticate_credentials(key)
+        user = cache.get(_cache_key(key))
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(
+                _cache_key(key), user, settings.AUTH_TOKEN_CACHE_TIMEOUT
+            )
+            return user, token
+        return user, Token(key=key, user=user)
+
+
+def user_from_claims(token):
+    '''Пользователь, собранный из claims токена без запроса к базе.'''
+    return User(
+        id=token[api_settings.USER_ID_CLAIM],
+        is_active=True,
+        **{field: token.get(field) for field in USER_CLAIMS},
+    )
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    '''JWT (Authorization: Bearer), для чтения без обращения к базе.
+
+    На запросы для чтения пользователь собирается из claims токена,
+    на запись загружается из базы. Смена данных, пароля или
+    деактивация вступают в силу при обновлении access-токена,
+    то есть не позже чем через ACCESS_TOKEN_LIFETIME.
+    '''
+
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = self.get_validated_token(raw_token)
+        if request.method in SAFE_METHODS:
+            return user_from_claims(token), token
+        return self.get_user(token), token
@@ -5,7 +5,32 @@ from django.utils.translation import gettext_lazy as _
 from users.validators import UsernameRegexValidator
 
 
-class User(AbstractUser):
+class CountersModel(models.Model):
+    '''Модель со счётчиками, которые меняют только атомарные UPDATE
+    из сигналов. Обычное сохранение загруженного ранее объекта их
+    не записывает, иначе затёрло бы изменения, сделанные после
+    загрузки.'''
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            # Отложенные поля Django тоже не пишет: они не загружены.
+            skipped = {*self.counter_fields, *self.get_deferred_fields()}
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.attname not in skipped
+            ]
+        super().save(*args, **kwargs)
+
+
+class User(CountersModel, AbstractUser):
     '''Пользователь (В рецепте - автор рецепта)'''
     username_validator = UsernameRegexValidator()
     username = models.CharField(
@@ -37,6 +62,18 @@ class User(AbstractUser):
         blank=True,
         verbose_name='Фамилия'
     )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
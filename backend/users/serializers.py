@@ -1,18 +1,62 @@
+from api.fields import ImageVariantsField
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from recipes.models import Recipe
 from rest_framework import serializers, status
-
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer, TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import USER_CLAIMS
 from .models import Follow, User
 
 
+def is_subscribed(request, author):
+    """Подписан ли текущий пользователь на автора.
+
+    Без аннотации is_subscribed id авторов загружаются один раз на запрос.
+    """
+    user = request.user
+    if user.is_anonymous:
+        return False
+    if hasattr(author, 'is_subscribed'):
+        return author.is_subscribed
+    if not hasattr(request, '_followed_author_ids'):
+        request._followed_author_ids = set(
+            user.follower.values_list('author_id', flat=True)
+        )
+    return author.id in request._followed_author_ids
+
+
+def get_recipes_limit(request):
+    """Значение recipes_limit из query-параметров или None."""
+    limit = request.GET.get('recipes_limit')
+    if not limit:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Ожидается целое неотрицательное число'}
+        )
+    return limit
+
+
 class YaRecipeSerializer(serializers.ModelSerializer):
     """Yet another recipe serializer"""
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
         fields = (
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         )
         read_only_fields = (
@@ -55,16 +99,13 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.follower.filter(author=obj).exists()
+        return is_subscribed(self.context.get('request'), obj)
 
 
 class FollowSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta(UserSerializer.Meta):
         fields = (
@@ -80,22 +121,16 @@ class FollowSerializer(serializers.ModelSerializer):
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return user.follower.filter(author=obj).exists()
+        return is_subscribed(self.context.get('request'), obj)
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = obj.recipes.all()
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(obj, 'limited_recipes'):
+            queryset = obj.limited_recipes
+        else:
+            limit = get_recipes_limit(self.context.get('request'))
+            queryset = obj.recipes.all()[:limit]
         return YaRecipeSerializer(queryset, many=True, read_only=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.all().count()
-
     def validate(self, data):
         author = self.instance
         user = self.context.get('request').user
@@ -110,3 +145,34 @@ class FollowSerializer(serializers.ModelSerializer):
                 code=status.HTTP_400_BAD_REQUEST,
             )
         return data
+
+
+def add_user_claims(token, user):
+    for field in USER_CLAIMS:
+        token[field] = getattr(user, field)
+    return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Пара JWT с полями пользователя в claims."""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Новый access-токен со свежими claims.
+
+    Пользователь перечитывается из базы, поэтому деактивированный
+    пользователь новый токен не получит.
+    """
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        user = User.objects.filter(
+            pk=refresh[api_settings.USER_ID_CLAIM], is_active=True
+        ).first()
+        if user is None:
+            raise AuthenticationFailed('Пользователь не найден или неактивен')
+        return {'access': str(add_user_claims(refresh.access_token, user))}
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens, token_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, **kwargs):
+    '''Смена пароля, деактивация и любое другое сохранение
+    пользователя сбрасывают его токены из кеша. User.objects.update()
+    сюда не попадает: после массовой деактивации вызовите
+    forget_tokens() для затронутых токенов.'''
+    if token_cache() is None:
+        return
+    forget_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    forget_tokens([instance.key])
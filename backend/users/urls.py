@@ -1,7 +1,11 @@
+from api import async_views
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import CustomUserViewSet
+from .views import (
+    ClaimsTokenObtainPairView, ClaimsTokenRefreshView, CustomUserViewSet,
+)
 
 app_name = 'api'
 
@@ -13,3 +17,26 @@ urlpatterns = [
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.AUTH_JWT:
+    urlpatterns += [
+        path(
+            'auth/jwt/create/',
+            ClaimsTokenObtainPairView.as_view(),
+            name='jwt-create',
+        ),
+        path(
+            'auth/jwt/refresh/',
+            ClaimsTokenRefreshView.as_view(),
+            name='jwt-refresh',
+        ),
+    ]
+
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = [
+        path(
+            'users/subscriptions/',
+            async_views.subscriptions_view,
+            name='user-subscriptions',
+        ),
+    ] + urlpatterns
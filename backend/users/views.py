@@ -1,25 +1,40 @@
-
-from api.pagination import CustomPagination
+from api.pagination import CursorModeMixin, CustomPagination
+from django.db.models import BooleanField, Exists, OuterRef, Prefetch, Value
 from djoser.views import UserViewSet
+from recipes.models import Recipe
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework_simplejwt.views import (
+    TokenObtainPairView, TokenRefreshView,
+)
 from users.models import Follow, User
 
 from .serializers import (
+    ClaimsTokenObtainPairSerializer, ClaimsTokenRefreshSerializer,
     CustomUserCreateSerializer, CustomUserSerializer, FollowSerializer,
+    get_recipes_limit,
 )
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(CursorModeMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
+    cursor_ordering = 'id'
 
     def get_queryset(self):
-        return User.objects.all()
+        user = self.request.user
+        queryset = User.objects.all()
+        if user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    user.follower.filter(author=OuterRef('pk'))
+                )
+            )
+        return queryset
 
     def get_serializer_class(self):
         if self.request.method in ['POST', 'PUT', 'PATCH']:
@@ -50,7 +65,15 @@ class CustomUserViewSet(UserViewSet):
     @action(detail=False, permission_classes=[IsAuthenticated])
     def subscriptions(self, request):
         user = request.user
-        queryset = User.objects.filter(following__user=user)
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_variants', 'cooking_time',
+            'author_id',
+        )[:get_recipes_limit(request)]
+        queryset = User.objects.filter(following__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        ).order_by('id')
         pages = self.paginate_queryset(queryset)
         serializer = FollowSerializer(
             pages,
@@ -58,3 +81,11 @@ class CustomUserViewSet(UserViewSet):
             context={'request': request}
         )
         return self.get_paginated_response(serializer.data)
+
+
+class ClaimsTokenObtainPairView(TokenObtainPairView):
+    serializer_class = ClaimsTokenObtainPairSerializer
+
+
+class ClaimsTokenRefreshView(TokenRefreshView):
+    serializer_class = ClaimsTokenRefreshSerializer